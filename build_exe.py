@@ -6,8 +6,21 @@
 import os
 import sys
 import subprocess
-import shutil
-import locale
+import collections
+import hashlib
+
+# onedir輸出目錄和主程序路徑
+DIST_DIR = os.path.join('dist', 'DesktopPet')
+EXE_PATH = os.path.join(DIST_DIR, 'DesktopPet.exe')
+
+# PyInstaller工作目錄和增量構建清單
+WORK_DIR = 'build'
+MANIFEST_PATH = os.path.join(WORK_DIR, '.manifest.sha')
+
+# 影響構建結果的輸入：源碼目錄、資源目錄和打包進去的單個文件
+SOURCE_DIRS = ['core', 'ui', 'utils']
+ASSET_DIRS = ['assets']
+INPUT_FILES = ['main.py', 'desktop_pet.spec', 'requirements.txt', 'README.md', 'config.json']
 
 def check_pyinstaller():
     """檢查PyInstaller是否已安裝"""
@@ -23,52 +36,84 @@ def check_pyinstaller():
 def create_spec_file():
     """創建PyInstaller規格文件"""
     spec_content = '''# -*- mode: python ; coding: utf-8 -*-
+import os
+import sys
+import shutil
 
 block_cipher = None
 
+# 程序未使用的Qt模組DLL，分析後從binaries中剔除
+unused_qt_binaries = ('Qt6Qml', 'Qt6Quick', 'Qt6Pdf', 'Qt6WebEngine', 'Qt63D', 'Qt6Charts')
+
+# 去除調試符號（需要PATH中有strip工具；否則保持原樣）
+# Windows上的DLL/PYD由MSVC構建，MinGW/Git-bash帶的GNU strip可能損壞它們或破壞簽名，不處理
+strip_binaries = sys.platform != 'win32' and shutil.which('strip') is not None
+
 a = Analysis(
     ['main.py'],
     pathex=[],
     binaries=[],
+    # assets和config.json由程序從工作目錄讀取，構建後直接複製到exe旁邊，不再打包進_internal
     datas=[
-        ('assets', 'assets'),
         ('README.md', '.'),
         ('requirements.txt', '.'),
-        ('config.json', '.'),
     ],
     hiddenimports=[
         'PySide6.QtCore',
         'PySide6.QtGui', 
         'PySide6.QtWidgets',
-        'pygame',
+        'PySide6.QtMultimedia',
         'loguru',
     ],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=[
+        # 標準庫中未使用的大型模組
+        'tkinter',
+        'unittest',
+        'test',
+        'pydoc',
+        'distutils',
+        'setuptools',
+        # email/http不排除：importlib.metadata需要email，urllib等會用到http.client
+        # 未使用的第三方庫
+        'numpy',
+        'scipy',
+        'PIL',
+        # 未使用的Qt模組（QtNetwork為QtMultimedia依賴，需保留）
+        'PySide6.QtQml',
+        'PySide6.QtQuick',
+        'PySide6.QtQuickWidgets',
+        'PySide6.QtPdf',
+        'PySide6.QtWebEngineCore',
+        'PySide6.QtWebEngineWidgets',
+        'PySide6.Qt3DCore',
+        'PySide6.Qt3DRender',
+        'PySide6.QtCharts',
+    ],
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
     noarchive=False,
 )
 
+a.binaries = [b for b in a.binaries
+              if not os.path.basename(b[0]).startswith(unused_qt_binaries)]
+
 pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
 
+# 使用onedir佈局：避免onefile每次啟動都解壓到臨時目錄
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.zipfiles,
-    a.datas,
     [],
+    exclude_binaries=True,
     name='DesktopPet',
     debug=False,
     bootloader_ignore_signals=False,
-    strip=False,
+    strip=strip_binaries,
     upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
     console=False,  # 不顯示控制台視窗
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -77,6 +122,26 @@ exe = EXE(
     entitlements_file=None,
     icon='assets/idle.gif',  # 使用idle.gif作為圖標
 )
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.zipfiles,
+    a.datas,
+    strip=strip_binaries,
+    upx=True,
+    # 啟動時必載的核心DLL不壓縮，避免解壓延遲和防毒軟體誤報
+    # upx_exclude按文件名逐字比較，不支持通配符，需寫出當前Python版本的DLL名
+    upx_exclude=[
+        'vcruntime140.dll',
+        'python3.dll',
+        f'python3{sys.version_info.minor}.dll',
+        'Qt6Core.dll',
+        'Qt6Gui.dll',
+        'Qt6Widgets.dll',
+    ],
+    name='DesktopPet',
+)
 '''
     
     with open('desktop_pet.spec', 'w', encoding='utf-8') as f:
@@ -84,7 +149,39 @@ exe = EXE(
     
     print("✅ 創建PyInstaller規格文件: desktop_pet.spec")
 
-def build_executable():
+def compute_build_hash():
+    """計算所有構建輸入的SHA256，用於判斷是否需要重新構建"""
+    files = [f for f in INPUT_FILES if os.path.isfile(f)]
+    for top in SOURCE_DIRS + ASSET_DIRS:
+        for root, dirs, names in os.walk(top):
+            dirs[:] = sorted(d for d in dirs if d != '__pycache__')
+            for name in sorted(names):
+                # 源碼目錄只看.py文件，資源目錄全部納入
+                if top in ASSET_DIRS or name.endswith('.py'):
+                    files.append(os.path.join(root, name))
+    
+    digest = hashlib.sha256()
+    for path in files:
+        digest.update(path.replace(os.sep, '/').encode('utf-8'))
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def read_manifest():
+    """讀取上次成功構建的哈希值"""
+    try:
+        with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def write_manifest(build_hash):
+    """記錄本次成功構建的哈希值"""
+    os.makedirs(WORK_DIR, exist_ok=True)
+    with open(MANIFEST_PATH, 'w', encoding='utf-8') as f:
+        f.write(build_hash)
+
+def build_executable(build_hash, full=False):
     """構建可執行文件"""
     print("🔨 開始構建Windows可執行文件...")
     
@@ -92,85 +189,54 @@ def build_executable():
     env = os.environ.copy()
     env['PYTHONIOENCODING'] = 'utf-8'
     
-    # 運行PyInstaller
+    # 運行PyInstaller（保留build目錄中的分析緩存，--full時才完全重建）
     cmd = [
         sys.executable, '-m', 'PyInstaller',
-        '--clean',
         '--noconfirm',
+        '--workpath', WORK_DIR,
         'desktop_pet.spec'
     ]
+    if full:
+        cmd.insert(3, '--clean')
+    
+    # 只保留最後若干行輸出，用於失敗時顯示
+    tail = collections.deque(maxlen=200)
     
     try:
-        # 獲取系統編碼
-        system_encoding = locale.getpreferredencoding()
-        print(f"🔤 系統編碼: {system_encoding}")
-        
-        # 使用系統編碼運行subprocess
-        result = subprocess.run(
-            cmd, 
-            capture_output=True, 
+        # 子進程已設為UTF-8輸出，逐行解碼並即時顯示
+        proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
             text=True,
-            encoding=system_encoding,
+            encoding='utf-8',
             errors='replace',  # 替換無法解碼的字符
             env=env
         )
+        for line in proc.stdout:
+            print(line, end='')
+            tail.append(line)
+        returncode = proc.wait()
         
-        if result.returncode == 0:
+        if returncode == 0:
             print("✅ 構建成功！")
-            print("📁 可執行文件位置: dist/DesktopPet.exe")
+            write_manifest(build_hash)
+            print(f"📁 可執行文件位置: {EXE_PATH}")
             
             # 檢查文件是否存在
-            exe_path = "dist/DesktopPet.exe"
-            if os.path.exists(exe_path):
-                size = os.path.getsize(exe_path) / (1024 * 1024)  # MB
+            if os.path.exists(EXE_PATH):
+                size = os.path.getsize(EXE_PATH) / (1024 * 1024)  # MB
                 print(f"📊 文件大小: {size:.1f} MB")
             
-            # 顯示構建輸出（如果有警告）
-            if result.stderr.strip():
-                print("⚠️ 構建警告:")
-                print(result.stderr[:1000] + "..." if len(result.stderr) > 1000 else result.stderr)
-            
             return True
         else:
             print("❌ 構建失敗！")
-            print(f"❌ 錯誤代碼: {result.returncode}")
-            
-            if result.stdout:
-                print("📝 標準輸出:")
-                print(result.stdout[:2000] + "..." if len(result.stdout) > 2000 else result.stdout)
-                
-            if result.stderr:
-                print("❌ 錯誤輸出:")
-                print(result.stderr[:2000] + "..." if len(result.stderr) > 2000 else result.stderr)
+            print(f"❌ 錯誤代碼: {returncode}")
+            print(f"📝 最後{len(tail)}行輸出:")
+            print(''.join(tail))
             
             return False
             
-    except UnicodeDecodeError as e:
-        print(f"❌ 編碼錯誤: {e}")
-        print("🔧 嘗試使用不同的編碼...")
-        
-        # 嘗試使用GB2312編碼（Windows中文系統）
-        try:
-            result = subprocess.run(
-                cmd, 
-                capture_output=True, 
-                text=True,
-                encoding='gb2312',
-                errors='replace',
-                env=env
-            )
-            
-            if result.returncode == 0:
-                print("✅ 使用GB2312編碼構建成功！")
-                return True
-            else:
-                print("❌ 即使使用GB2312編碼也構建失敗")
-                return False
-                
-        except Exception as e2:
-            print(f"❌ GB2312編碼也失敗: {e2}")
-            return False
-            
     except Exception as e:
         print(f"❌ 構建過程出錯: {e}")
         print("🔧 嘗試手動運行以下命令:")
@@ -178,25 +244,26 @@ def build_executable():
         return False
 
 def copy_required_files():
-    """複製必要的文件到dist目錄"""
+    """複製必要的文件到輸出目錄"""
+    import shutil
     print("📁 複製必要文件...")
     
-    # 確保dist目錄存在
-    if not os.path.exists('dist'):
-        os.makedirs('dist')
+    # 確保輸出目錄存在
+    if not os.path.exists(DIST_DIR):
+        os.makedirs(DIST_DIR)
     
     # 複製配置文件
     if os.path.exists('config.json'):
-        shutil.copy2('config.json', 'dist/')
+        shutil.copy2('config.json', DIST_DIR)
         print("✅ 複製 config.json")
     
-    # 複製assets目錄（如果PyInstaller沒有正確處理）
-    if os.path.exists('assets') and not os.path.exists('dist/assets'):
-        shutil.copytree('assets', 'dist/assets')
+    # 複製assets目錄（程序從工作目錄讀取assets，spec中不再重複打包）
+    if os.path.exists('assets'):
+        shutil.copytree('assets', os.path.join(DIST_DIR, 'assets'), dirs_exist_ok=True)
         print("✅ 複製 assets 目錄")
     
     # 創建logs目錄
-    logs_dir = 'dist/logs'
+    logs_dir = os.path.join(DIST_DIR, 'logs')
     if not os.path.exists(logs_dir):
         os.makedirs(logs_dir)
         print("✅ 創建 logs 目錄")
@@ -207,6 +274,7 @@ def create_installer_info():
 
 ## 📦 文件說明
 - `DesktopPet.exe`: 桌面寵物主程序
+- `_internal/`: 運行所需的Python和Qt庫（請勿刪除）
 - `assets/`: 動畫和音效資源文件夾
 - `config.json`: 配置文件
 - `logs/`: 日誌文件夾
@@ -238,7 +306,7 @@ def create_installer_info():
 
 ## 🆘 問題排除
 如果程序無法啟動：
-1. 確保assets文件夾與exe文件在同一目錄
+1. 確保assets和_internal文件夾與exe文件在同一目錄
 2. 檢查Windows防火牆設置
 3. 以管理員身份運行
 4. 查看logs文件夾中的日誌文件
@@ -246,11 +314,12 @@ def create_installer_info():
 版本: v1.1.0
 """
     
-    os.makedirs('dist', exist_ok=True)
-    with open('dist/README_Windows.txt', 'w', encoding='utf-8') as f:
+    os.makedirs(DIST_DIR, exist_ok=True)
+    info_path = os.path.join(DIST_DIR, 'README_Windows.txt')
+    with open(info_path, 'w', encoding='utf-8') as f:
         f.write(info_content)
     
-    print("✅ 創建安裝說明: dist/README_Windows.txt")
+    print(f"✅ 創建安裝說明: {info_path}")
 
 def main():
     """主函數"""
@@ -272,8 +341,18 @@ def main():
     # 創建規格文件
     create_spec_file()
     
+    # --full: 清除緩存完全重建；--force: 忽略清單強制構建
+    full = '--full' in sys.argv
+    force = full or '--force' in sys.argv
+    
+    # 輸入未變更且上次的輸出仍在時直接跳過
+    build_hash = compute_build_hash()
+    if not force and build_hash == read_manifest() and os.path.exists(EXE_PATH):
+        print("⏭️ 構建輸入未變更，跳過構建（使用 --force 強制重新構建）")
+        return 0
+    
     # 構建可執行文件
-    if build_executable():
+    if build_executable(build_hash, full=full):
         # 複製必要文件
         copy_required_files()
         
@@ -281,18 +360,18 @@ def main():
         create_installer_info()
         
         print("\n🎉 打包完成！")
-        print("📁 輸出目錄: dist/")
-        print("🚀 可執行文件: dist/DesktopPet.exe")
+        print(f"📁 輸出目錄: {DIST_DIR}")
+        print(f"🚀 可執行文件: {EXE_PATH}")
         print("\n💡 提示:")
-        print("   - 將整個dist文件夾分發給用戶")
-        print("   - 或者創建安裝包包含dist文件夾內容")
-        print("   - 可執行文件已包含所有依賴，無需安裝Python")
+        print(f"   - 將整個 {DIST_DIR} 文件夾分發給用戶")
+        print("   - 或者創建安裝包包含該文件夾內容")
+        print("   - 文件夾已包含所有依賴，無需安裝Python")
         
         return 0
     else:
         print("\n🔧 如果問題持續，請嘗試:")
         print("   1. 更新PyInstaller: pip install --upgrade pyinstaller")
-        print("   2. 清理緩存: python -m PyInstaller --clean desktop_pet.spec")
+        print("   2. 清理緩存完全重建: python build_exe.py --full")
         print("   3. 檢查Python版本兼容性")
         
         return 1
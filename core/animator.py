@@ -2,13 +2,30 @@
 桌面寵物動畫控制器
 負責管理動畫播放、狀態切換和動畫效果
 """
-from PySide6.QtGui import QMovie
-from PySide6.QtCore import QSize, QObject, Signal
+from PySide6.QtGui import QMovie, QPixmap, QPixmapCache
+from PySide6.QtCore import QSize, QObject, Signal, QTimer
 import os
 from enum import Enum
 from loguru import logger
 
 
+# 所有實例共用的幀內存預算（KB），超出時由QPixmapCache按最近最少使用淘汰
+PIXMAP_CACHE_LIMIT_KB = 32 * 1024
+
+# 跨實例共享的動畫來源：(文件路徑, 寬, 高) -> (QMovie, 延遲列表)
+# QMovie保留用於在幀被淘汰後重新解碼
+_ANIMATION_CACHE = {}
+
+# 各動畫來源被多少個實例使用，降為0時才釋放來源及其幀
+_SOURCE_REFS = {}
+
+
+def _frame_cache_key(source_key, index: int) -> str:
+    """QPixmapCache中單幀的鍵"""
+    file_path, width, height = source_key
+    return f"{file_path}@{width}x{height}:{index}"
+
+
 class AnimationState(Enum):
     """動畫狀態枚舉"""
     IDLE = "idle"          # 閒置狀態（原rest）
@@ -25,14 +42,38 @@ class AnimationController(QObject):
     # 信號定義
     animation_changed = Signal(str)  # 動畫切換信號
     animation_finished = Signal()    # 動畫完成信號
+    frame_changed = Signal(QPixmap)  # 當前幀更新信號
+    
+    # GIF未提供延遲時的預設幀間隔（毫秒）
+    DEFAULT_FRAME_DELAY = 100
     
     def __init__(self, assets_path="assets"):
         super().__init__()
         self.assets_path = assets_path
         self.current_state = AnimationState.IDLE
-        self.movies = {}  # 存儲所有動畫對象
-        self.current_movie = None
+        self.asset_files = frozenset()  # 資源目錄中的文件名
+        self.animation_paths = {}  # 各狀態的動畫文件路徑
+        self.sources = {}          # 各狀態已載入的動畫來源鍵
+        self._held_sources = set() # 本實例計入_SOURCE_REFS的來源鍵
+        self.frame_delays = {}     # 各狀態每幀的延遲 (list[int])
+        self.loop_counts = {}      # 各狀態GIF的重複次數，-1表示無限循環
+        self.current_source = None
+        self.current_delays = None
+        self.current_loop_count = -1
+        self._loops_left = -1      # 當前動畫剩餘的重複次數，與QMovie相同：共播放loopCount+1遍
+        self.current_frame_index = 0
         self.default_size = QSize(150, 150)
+        self.playback_speed = 1.0
+        self.is_paused = False
+        
+        # 幀存放在全局QPixmapCache中，只在預算不足時調高上限
+        if QPixmapCache.cacheLimit() < PIXMAP_CACHE_LIMIT_KB:
+            QPixmapCache.setCacheLimit(PIXMAP_CACHE_LIMIT_KB)
+        
+        # 單一播放定時器，按幀延遲推進
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setSingleShot(True)
+        self.frame_timer.timeout.connect(self._advance_frame)
         
         self._load_animations()
         
@@ -47,86 +88,274 @@ class AnimationController(QObject):
             AnimationState.SLEEP: "sleep.gif"
         }
         
+        # 一次列出資源目錄，代替逐個文件檢查是否存在
+        self.asset_files = self._scan_assets()
+        
+        # 只記錄可用的文件路徑，幀在首次切換到該狀態時才解碼
         for state, filename in animation_files.items():
             file_path = os.path.join(self.assets_path, filename)
-            if os.path.exists(file_path):
-                movie = QMovie(file_path)
-                movie.setScaledSize(self.default_size)
-                self.movies[state] = movie
-                logger.info(f"載入動畫: {filename}")
+            if filename in self.asset_files:
+                self.animation_paths[state] = file_path
             else:
                 logger.warning(f"動畫文件不存在: {file_path}")
+        
+        # 閒置動畫啟動即需顯示，預先載入
+        self._load_one(AnimationState.IDLE)
+    
+    def _scan_assets(self) -> frozenset:
+        """列出資源目錄中的所有文件名"""
+        try:
+            with os.scandir(self.assets_path) as entries:
+                return frozenset(e.name for e in entries if e.is_file())
+        except OSError as e:
+            logger.warning(f"無法讀取資源目錄: {e}")
+            return frozenset()
+    
+    def _load_one(self, state: AnimationState) -> bool:
+        """解碼單個狀態的動畫，已載入則直接返回"""
+        if state in self.sources:
+            return True
+        
+        file_path = self.animation_paths.get(state)
+        if file_path is None:
+            return False
+        
+        source_key, movie, delays = self._decode_frames(file_path, self.default_size)
+        if not delays:
+            logger.warning(f"動畫文件無法解碼: {file_path}")
+            return False
+        
+        self._acquire_source(source_key, movie, delays)
+        self.sources[state] = source_key
+        self.frame_delays[state] = delays
+        self.loop_counts[state] = movie.loopCount()
+        logger.info(f"載入動畫: {os.path.basename(file_path)} ({len(delays)}幀)")
+        return True
+    
+    def _decode_frames(self, file_path: str, size: QSize):
+        """一次性解碼GIF所有幀放入QPixmapCache，返回來源鍵、解碼器和延遲列表
+        
+        解碼器不在此登記到_ANIMATION_CACHE，由_acquire_source在計入引用時登記
+        """
+        source_key = (file_path, size.width(), size.height())
+        cached = _ANIMATION_CACHE.get(source_key)
+        if cached is not None:
+            return source_key, cached[0], cached[1]
+        
+        movie = QMovie(file_path)
+        movie.setScaledSize(size)
+        
+        delays = []
+        for i in range(movie.frameCount()):
+            if not movie.jumpToFrame(i):
+                break
+            QPixmapCache.insert(_frame_cache_key(source_key, i), movie.currentPixmap())
+            delay = movie.nextFrameDelay()
+            delays.append(delay if delay > 0 else self.DEFAULT_FRAME_DELAY)
+        
+        return source_key, movie, delays
+    
+    @staticmethod
+    def _get_frame(source_key, index: int):
+        """從QPixmapCache取出幀，已被淘汰時從QMovie重新解碼"""
+        cache_key = _frame_cache_key(source_key, index)
+        pixmap = QPixmap()
+        if QPixmapCache.find(cache_key, pixmap):
+            return pixmap
+        
+        cached = _ANIMATION_CACHE.get(source_key)
+        if cached is None:
+            # 來源已被全局清理，用臨時解碼器取出這一幀，不重新登記來源也不緩存幀
+            file_path, width, height = source_key
+            movie = QMovie(file_path)
+            movie.setScaledSize(QSize(width, height))
+            return movie.currentPixmap() if movie.jumpToFrame(index) else None
+        
+        movie = cached[0]
+        if not movie.jumpToFrame(index):
+            return None
+        pixmap = movie.currentPixmap()
+        QPixmapCache.insert(cache_key, pixmap)
+        return pixmap
+    
+    def _acquire_source(self, source_key, movie: QMovie, delays: list):
+        """登記本實例使用某個共享來源，來源尚未登記時放入_ANIMATION_CACHE"""
+        _ANIMATION_CACHE.setdefault(source_key, (movie, delays))
+        if source_key not in self._held_sources:
+            self._held_sources.add(source_key)
+            _SOURCE_REFS[source_key] = _SOURCE_REFS.get(source_key, 0) + 1
+    
+    def _drop_source(self, source_key):
+        """取消本實例對某個共享來源的使用，已無實例使用時才釋放"""
+        if source_key not in self._held_sources:
+            return
+        self._held_sources.discard(source_key)
+        refs = _SOURCE_REFS.get(source_key, 1) - 1
+        if refs > 0:
+            _SOURCE_REFS[source_key] = refs
+        else:
+            _SOURCE_REFS.pop(source_key, None)
+            self._release_source(source_key)
+    
+    @staticmethod
+    def _release_source(source_key):
+        """移除一個動畫來源及其在QPixmapCache中的幀"""
+        cached = _ANIMATION_CACHE.pop(source_key, None)
+        if cached is not None:
+            movie = cached[0]
+            for i in range(max(len(cached[1]), movie.frameCount())):
+                QPixmapCache.remove(_frame_cache_key(source_key, i))
+    
+    @staticmethod
+    def clear_global_cache():
+        """清空跨實例共享的動畫緩存"""
+        for source_key in list(_ANIMATION_CACHE):
+            AnimationController._release_source(source_key)
+    
+    def _emit_current_frame(self):
+        """發送當前幀"""
+        pixmap = self._get_frame(self.current_source, self.current_frame_index)
+        if pixmap is not None:
+            self.frame_changed.emit(pixmap)
     
     def set_animation_size(self, size: QSize):
         """設置動畫尺寸"""
+        if size == self.default_size:
+            return
+        
         self.default_size = size
-        for movie in self.movies.values():
-            movie.setScaledSize(size)
+        
+        # 從原始文件重新解碼一次，避免放大已縮放的幀造成模糊
+        # 只處理已載入的狀態，其餘在首次使用時按新尺寸解碼
+        # 舊尺寸的來源可能仍被其他實例播放，只在無實例使用時才釋放其幀預算
+        for state in list(self.sources):
+            source_key, movie, delays = self._decode_frames(self.animation_paths[state], size)
+            if delays:
+                old_key = self.sources[state]
+                self._acquire_source(source_key, movie, delays)
+                self.sources[state] = source_key
+                self.frame_delays[state] = delays
+                self.loop_counts[state] = movie.loopCount()
+                self._drop_source(old_key)
+        
+        if self.current_source is not None and self.current_state in self.sources:
+            self.current_source = self.sources[self.current_state]
+            self.current_delays = self.frame_delays[self.current_state]
+            self.current_loop_count = self.loop_counts[self.current_state]
+            self.current_frame_index %= len(self.current_delays)
+            self._emit_current_frame()
             
     def switch_to_state(self, state: AnimationState):
         """切換到指定動畫狀態"""
-        if state == self.current_state:
+        if state == self.current_state and self.current_source is not None:
             return
             
-        if state in self.movies:
+        if self._load_one(state):
             # 停止當前動畫
-            if self.current_movie:
-                self.current_movie.stop()
+            self.frame_timer.stop()
+            self.is_paused = False
                 
             # 切換到新動畫
             self.current_state = state
-            self.current_movie = self.movies[state]
+            self.current_source = self.sources[state]
+            self.current_delays = self.frame_delays[state]
+            self.current_loop_count = self.loop_counts[state]
+            self._loops_left = self.current_loop_count
+            self.current_frame_index = 0
             
             # 發送信號
             self.animation_changed.emit(state.value)
-            logger.info(f"切換到動畫狀態: {state.value}")
+            logger.debug(f"切換到動畫狀態: {state.value}")
         else:
             logger.error(f"動畫狀態不存在: {state}")
     
-    def get_current_movie(self):
-        """獲取當前動畫對象"""
-        return self.current_movie
+    def get_current_frame(self):
+        """獲取當前幀"""
+        if self.current_source is not None:
+            return self._get_frame(self.current_source, self.current_frame_index)
+        return None
+    
+    def _schedule_next_frame(self):
+        """按當前幀延遲和播放速度安排下一幀"""
+        delay = self.current_delays[self.current_frame_index]
+        self.frame_timer.start(max(1, int(delay / self.playback_speed)))
+    
+    def _advance_frame(self):
+        """推進到下一幀"""
+        if self.current_source is None or self.is_paused:
+            return
+        
+        next_index = self.current_frame_index + 1
+        if next_index >= len(self.current_delays):
+            # 一遍播完：重複次數用盡時停在最後一幀並發出完成信號（與QMovie一致）
+            if self._loops_left == 0:
+                self.animation_finished.emit()
+                return
+            if self._loops_left > 0:
+                self._loops_left -= 1
+            next_index = 0
+        
+        self.current_frame_index = next_index
+        self._emit_current_frame()
+        self._schedule_next_frame()
     
     def start_animation(self):
-        """開始播放當前動畫"""
-        if self.current_movie:
-            self.current_movie.start()
+        """開始播放當前動畫（已在播放時不重新開始，暫停時恢復）"""
+        if self.is_paused:
+            self.resume_animation()
+        elif self.current_source is not None and not self.frame_timer.isActive():
+            self.current_frame_index = 0
+            self._loops_left = self.current_loop_count
+            self._emit_current_frame()
+            self._schedule_next_frame()
             
     def stop_animation(self):
         """停止當前動畫"""
-        if self.current_movie:
-            self.current_movie.stop()
+        self.frame_timer.stop()
+        self.is_paused = False
             
     def pause_animation(self):
         """暫停當前動畫"""
-        if self.current_movie:
-            self.current_movie.setPaused(True)
+        if self.current_source is not None:
+            self.frame_timer.stop()
+            self.is_paused = True
             
     def resume_animation(self):
         """恢復動畫播放"""
-        if self.current_movie:
-            self.current_movie.setPaused(False)
+        if self.current_source is not None and self.is_paused:
+            self.is_paused = False
+            self._schedule_next_frame()
     
     def set_animation_speed(self, speed: float):
         """設置動畫播放速度 (1.0為正常速度)"""
-        if self.current_movie:
-            # PySide6中通過設置frame延遲來控制速度
-            original_speed = self.current_movie.speed()
-            self.current_movie.setSpeed(int(original_speed * speed))
+        if speed <= 0:
+            logger.warning(f"無效的動畫速度: {speed}")
+            return
+        self.playback_speed = speed
+        if self.frame_timer.isActive():
+            self._schedule_next_frame()
     
     def get_available_states(self):
         """獲取可用的動畫狀態列表"""
-        return list(self.movies.keys())
+        return list(self.animation_paths.keys())
     
     def is_animation_running(self):
         """檢查動畫是否正在運行"""
-        if self.current_movie:
-            return self.current_movie.state() == QMovie.State.Running
-        return False
+        return self.frame_timer.isActive()
     
     def cleanup(self):
         """清理資源"""
-        for movie in self.movies.values():
-            movie.stop()
-        self.movies.clear()
+        self.frame_timer.stop()
+        try:
+            self.frame_timer.timeout.disconnect()
+        except (TypeError, RuntimeError):
+            pass  # 沒有連接
+        # 共享來源和QPixmapCache中的幀可能仍被其他實例使用，只在最後一個使用者清理時釋放
+        for source_key in list(self._held_sources):
+            self._drop_source(source_key)
+        self.sources.clear()
+        self.frame_delays.clear()
+        self.loop_counts.clear()
+        self.current_source = None
+        self.current_delays = None
         logger.info("動畫控制器資源已清理")
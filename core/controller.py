@@ -2,16 +2,25 @@
 桌面寵物核心控制器
 整合所有模組功能，作為應用程序的中央協調器
 """
-from PySide6.QtCore import QObject, Signal, QTimer, QPoint
-from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import QObject, Signal, QTimer, Qt
+from PySide6.QtGui import QPixmap
 from .animator import AnimationController, AnimationState
 from .events import EventHandler
 from utils.config import config_manager
 from loguru import logger
-import pygame
+from enum import Enum
+import itertools
 import os
 
 
+class SleepPhase(Enum):
+    """睡眠計時階段"""
+    AWAKE = "awake"            # 清醒，等待打哈欠
+    SLEEPY = "sleepy"          # 打哈欠中
+    PRE_SLEEP = "pre_sleep"    # 打完哈欠，等待入睡
+    SLEEPING = "sleeping"      # 睡覺中
+
+
 class PetController(QObject):
     """桌面寵物核心控制器"""
     
@@ -20,6 +29,7 @@ class PetController(QObject):
     notification_triggered = Signal(str)
     reminder_message = Signal(str)  # 提醒消息信號
     feeding_finished = Signal()     # 餵食完成信號
+    frame_changed = Signal(QPixmap) # 動畫幀更新信號
     
     def __init__(self, assets_path="assets"):
         super().__init__()
@@ -40,22 +50,30 @@ class PetController(QObject):
         self.click_reset_timer.timeout.connect(self._reset_click_count)
         self.is_feeding = False
         
-        # 睡眠機制定時器
-        self.sleepy_timer = QTimer()
-        self.sleepy_timer.setSingleShot(True)
-        self.sleepy_timer.timeout.connect(self._start_sleepy)
+        # 睡眠機制定時器，按階段依次推進：閒置 -> 打哈欠 -> 閒置 -> 睡覺
+        self._sleep_phase = SleepPhase.AWAKE
+        self._sleep_timer = QTimer(self)
+        self._sleep_timer.setSingleShot(True)
+        self._sleep_timer.timeout.connect(self._sleep_tick)
+        
+        # 狀態過渡定時器（返回閒置），新的過渡會取代尚未觸發的舊過渡
+        self._transition_timer = QTimer(self)
+        self._transition_timer.setSingleShot(True)
+        self._transition_timer.timeout.connect(self._run_pending_transition)
+        self._pending_transition = None
         
-        self.sleep_timer = QTimer()
-        self.sleep_timer.setSingleShot(True)
-        self.sleep_timer.timeout.connect(self._start_sleep)
+        # 餵食結束定時器，與過渡定時器分開以免被點擊/拖拽取消
+        self._feeding_timer = QTimer(self)
+        self._feeding_timer.setSingleShot(True)
+        self._feeding_timer.timeout.connect(self._finish_feeding)
         
         # 從配置載入設置
         self._load_settings()
         
-        # 定時提醒
-        self.reminder_timer = QTimer()
+        # 定時提醒（分鐘級間隔，用秒級精度的粗略定時器，讓系統合併喚醒）
+        self.reminder_timer = QTimer(self)
+        self.reminder_timer.setTimerType(Qt.TimerType.VeryCoarseTimer)
         self.reminder_timer.timeout.connect(self._on_reminder)
-        self.current_reminder_index = 0
         
         # 狀態管理
         self.current_state = AnimationState.IDLE
@@ -74,13 +92,17 @@ class PetController(QObject):
     def _init_audio(self):
         """初始化音效系統"""
         try:
-            pygame.mixer.init()
+            from PySide6.QtMultimedia import QSoundEffect
+            from PySide6.QtCore import QUrl
             self.sound_effects = {}
             
             # 載入音效文件
+            # 沿用動畫控制器掃描資源目錄的結果
             meow_sound_path = os.path.join(self.assets_path, "meow.wav")
-            if os.path.exists(meow_sound_path):
-                self.sound_effects['meow'] = pygame.mixer.Sound(meow_sound_path)
+            if "meow.wav" in self.animation_controller.asset_files:
+                meow = QSoundEffect(self)
+                meow.setSource(QUrl.fromLocalFile(os.path.abspath(meow_sound_path)))
+                self.sound_effects['meow'] = meow
                 logger.info("meow音效載入成功")
             else:
                 logger.warning(f"音效文件不存在: {meow_sound_path}")
@@ -104,10 +126,44 @@ class PetController(QObject):
         
         # 動畫控制器信號連接
         self.animation_controller.animation_changed.connect(self._on_animation_changed)
+        self.animation_controller.frame_changed.connect(self.frame_changed)
+    
+    def _disconnect_signals(self):
+        """斷開所有信號連接，釋放槽函數持有的引用"""
+        signals = (
+            self.event_handler.click_detected,
+            self.event_handler.drag_started,
+            self.event_handler.drag_moved,
+            self.event_handler.drag_finished,
+            self.event_handler.double_click,
+            self.event_handler.right_click,
+            self.event_handler.hover_enter,
+            self.event_handler.hover_leave,
+            self.event_handler.idle_timeout,
+            self.animation_controller.animation_changed,
+            self.animation_controller.frame_changed,
+            # 本控制器對外發出的信號（主視窗等連接）
+            self.state_changed,
+            self.notification_triggered,
+            self.reminder_message,
+            self.feeding_finished,
+            self.frame_changed,
+            # 定時器回調
+            self.click_reset_timer.timeout,
+            self.reminder_timer.timeout,
+            self._transition_timer.timeout,
+            self._feeding_timer.timeout,
+            self._sleep_timer.timeout,
+        )
+        for signal in signals:
+            try:
+                signal.disconnect()
+            except (TypeError, RuntimeError):
+                pass  # 沒有連接
     
-    def _on_click(self, position: QPoint):
+    def _on_click(self, x: int, y: int):
         """處理點擊事件"""
-        logger.info(f"寵物被點擊: {position}")
+        logger.info(f"寵物被點擊: ({x}, {y})")
         
         # 重置睡眠定時器
         self._reset_sleep_timers()
@@ -135,11 +191,11 @@ class PetController(QObject):
         self.animation_controller.start_animation()
         
         # 2秒後返回閒置狀態
-        QTimer.singleShot(2000, lambda: self._return_to_idle())
+        self._schedule_transition(2000, self._return_to_idle)
     
-    def _on_drag_start(self, position: QPoint):
+    def _on_drag_start(self, x: int, y: int):
         """處理拖拽開始事件"""
-        logger.info(f"開始拖拽寵物: {position}")
+        logger.info(f"開始拖拽寵物: ({x}, {y})")
         
         # 重置睡眠定時器
         self._reset_sleep_timers()
@@ -150,44 +206,44 @@ class PetController(QObject):
         
         self.is_interaction_mode = True
     
-    def _on_drag_move(self, position: QPoint):
+    def _on_drag_move(self, x: int, y: int):
         """處理拖拽移動事件"""
         # 這裡主要由主視窗處理位置更新
         pass
     
-    def _on_drag_finish(self, position: QPoint):
+    def _on_drag_finish(self, x: int, y: int):
         """處理拖拽結束事件"""
-        logger.info(f"拖拽結束: {position}")
+        logger.info(f"拖拽結束: ({x}, {y})")
         
         self.is_interaction_mode = False
         
         # 延遲返回閒置狀態並重啟睡眠計時
-        QTimer.singleShot(1000, lambda: self._return_to_idle())
+        self._schedule_transition(1000, self._return_to_idle)
     
-    def _on_double_click(self, position: QPoint):
+    def _on_double_click(self, x: int, y: int):
         """處理雙擊事件"""
-        logger.info(f"寵物被雙擊: {position}")
+        logger.info(f"寵物被雙擊: ({x}, {y})")
         
         # 雙擊觸發特殊動畫或功能
         self._show_notification("你雙擊了我！好開心～")
     
-    def _on_right_click(self, position: QPoint):
+    def _on_right_click(self, x: int, y: int):
         """處理右鍵點擊事件"""
-        logger.info(f"右鍵點擊寵物: {position}")
+        logger.info(f"右鍵點擊寵物: ({x}, {y})")
         
         # 右鍵可以觸發菜單或特殊功能
         self._show_notification("右鍵功能菜單（待實現）")
     
     def _on_hover_enter(self):
         """處理鼠標懸停進入事件"""
-        logger.info("鼠標懸停在寵物上")
+        logger.debug("鼠標懸停在寵物上")
         
         # 可以顯示一些提示信息
         pass
     
     def _on_hover_leave(self):
         """處理鼠標懸停離開事件"""
-        logger.info("鼠標離開寵物")
+        logger.debug("鼠標離開寵物")
         pass
     
     def _on_idle(self):
@@ -200,9 +256,21 @@ class PetController(QObject):
     
     def _on_animation_changed(self, animation_name: str):
         """處理動畫變化事件"""
-        logger.info(f"動畫已切換到: {animation_name}")
+        logger.debug(f"動畫已切換到: {animation_name}")
         self.state_changed.emit(animation_name)
     
+    def _schedule_transition(self, delay_ms: int, callback):
+        """安排一次狀態過渡，取代尚未觸發的過渡"""
+        self._pending_transition = callback
+        self._transition_timer.start(delay_ms)
+    
+    def _run_pending_transition(self):
+        """執行待處理的狀態過渡"""
+        callback = self._pending_transition
+        self._pending_transition = None
+        if callback:
+            callback()
+    
     def _return_to_idle(self):
         """返回閒置狀態"""
         if not self.is_interaction_mode and not self.is_feeding:
@@ -215,40 +283,39 @@ class PetController(QObject):
         self.click_count = 0
     
     def _start_sleep_timers(self):
-        """啟動睡眠相關定時器"""
+        """從清醒階段開始睡眠計時"""
         if not self.is_interaction_mode and not self.is_feeding:
-            self.sleepy_timer.stop()
-            self.sleep_timer.stop()
-            self.sleepy_timer.start(15000)  # 15秒後打哈欠
+            self._sleep_phase = SleepPhase.AWAKE
+            self._sleep_timer.start(15000)  # 15秒後打哈欠
     
     def _reset_sleep_timers(self):
         """重置睡眠定時器"""
-        self.sleepy_timer.stop()
-        self.sleep_timer.stop()
-        if not self.is_interaction_mode and not self.is_feeding:
-            self._start_sleep_timers()
+        self._sleep_timer.stop()
+        self._sleep_phase = SleepPhase.AWAKE
+        self._start_sleep_timers()
     
-    def _start_sleepy(self):
-        """開始打哈欠"""
-        if not self.is_interaction_mode and not self.is_feeding:
+    def _sleep_tick(self):
+        """睡眠計時到期，推進到下一階段"""
+        if self.is_interaction_mode or self.is_feeding:
+            return
+        
+        if self._sleep_phase == SleepPhase.AWAKE:
+            # 開始打哈欠，2秒後回到idle
             self.animation_controller.switch_to_state(AnimationState.SLEEPY)
             self.animation_controller.start_animation()
-            # 打哈欠2秒後回到idle，然後再啟動sleep計時
-            QTimer.singleShot(2000, self._return_to_idle_from_sleepy)
-    
-    def _return_to_idle_from_sleepy(self):
-        """從打哈欠回到idle狀態"""
-        if not self.is_interaction_mode and not self.is_feeding:
+            self._sleep_phase = SleepPhase.SLEEPY
+            self._sleep_timer.start(2000)
+        elif self._sleep_phase == SleepPhase.SLEEPY:
+            # 打完哈欠回到idle，再15秒後睡覺
             self.animation_controller.switch_to_state(AnimationState.IDLE)
             self.animation_controller.start_animation()
-            # 再15秒後睡覺
-            self.sleep_timer.start(15000)
-    
-    def _start_sleep(self):
-        """開始睡覺"""
-        if not self.is_interaction_mode and not self.is_feeding:
+            self._sleep_phase = SleepPhase.PRE_SLEEP
+            self._sleep_timer.start(15000)
+        elif self._sleep_phase == SleepPhase.PRE_SLEEP:
+            # 開始睡覺
             self.animation_controller.switch_to_state(AnimationState.SLEEP)
             self.animation_controller.start_animation()
+            self._sleep_phase = SleepPhase.SLEEPING
     
     def feed_pet(self):
         """餵食寵物"""
@@ -265,7 +332,7 @@ class PetController(QObject):
         self.animation_controller.start_animation()
         
         # 3秒後結束餵食
-        QTimer.singleShot(3000, self._finish_feeding)
+        self._feeding_timer.start(3000)
         
         self._show_notification("好好吃～謝謝你的餵食！")
     
@@ -295,8 +362,7 @@ class PetController(QObject):
     
     def _on_reminder(self):
         """定時提醒回調"""
-        message = self.reminder_messages[self.current_reminder_index]
-        self.current_reminder_index = (self.current_reminder_index + 1) % len(self.reminder_messages)
+        message = next(self._reminder_cycle)
         
         # 發送提醒消息信號（顯示在主窗口上）
         self.reminder_message.emit(message)
@@ -320,13 +386,18 @@ class PetController(QObject):
         """設置提醒間隔"""
         self.reminder_interval = minutes * 60 * 1000
         if self.reminder_timer.isActive():
-            self.reminder_timer.stop()
-            self.reminder_timer.start(self.reminder_interval)
+            self.reminder_timer.start(self.reminder_interval)  # start會重新計時
         logger.info(f"提醒間隔已設置為: {minutes}分鐘")
     
-    def get_current_movie(self):
-        """獲取當前動畫對象"""
-        return self.animation_controller.get_current_movie()
+    def set_reminder_messages(self, messages: list):
+        """設置提醒消息，並從第一條重新開始輪換"""
+        self.reminder_messages = messages
+        self._reminder_cycle = itertools.cycle(self.reminder_messages)
+        logger.info(f"提醒消息已更新，共{len(messages)}條")
+    
+    def get_current_frame(self):
+        """獲取當前動畫幀"""
+        return self.animation_controller.get_current_frame()
     
     def get_event_handler(self):
         """獲取事件處理器"""
@@ -342,12 +413,18 @@ class PetController(QObject):
     def cleanup(self):
         """清理資源"""
         self.reminder_timer.stop()
+        self.click_reset_timer.stop()
+        self._transition_timer.stop()
+        self._feeding_timer.stop()
+        self._sleep_timer.stop()
+        self._disconnect_signals()
         self.animation_controller.cleanup()
         self.event_handler.cleanup()
         
         # 清理音效資源
-        if hasattr(pygame.mixer, 'quit'):
-            pygame.mixer.quit()
+        for sound in self.sound_effects.values():
+            sound.stop()
+        self.sound_effects.clear()
             
         logger.info("控制器資源已清理")
     
@@ -371,16 +448,18 @@ class PetController(QObject):
             "深呼吸，放松一下～",
             "記得活動手腕和頸部！"
         ])
+        self._reminder_cycle = itertools.cycle(self.reminder_messages)
         self.sound_enabled = config_manager.get('sound_enabled', True)
         logger.info(f"設置已載入 - 提醒間隔: {self.reminder_interval/1000/60}分鐘, 音效: {self.sound_enabled}")
     
     def save_settings(self):
-        """保存當前設置到配置文件"""
+        """保存設置到配置文件"""
         config_manager.update({
             'reminder_interval': self.reminder_interval // (60 * 1000),  # 轉換為分鐘
             'reminder_enabled': self.reminder_timer.isActive(),
             'sound_enabled': self.sound_enabled,
             'reminder_messages': self.reminder_messages
         })
+        # 實際寫入由配置管理器延遲合併，退出前會自動寫入
         config_manager.save_config()
-        logger.info("設置已保存到配置文件")
+        logger.info("設置已提交到配置管理器")
@@ -2,13 +2,56 @@
 桌面寵物事件處理器
 負責處理鼠標、鍵盤和系統事件
 """
-from PySide6.QtCore import QObject, Signal, QTimer, QPoint, Qt
+from PySide6.QtCore import QObject, Signal, QTimer, Qt
 from PySide6.QtGui import QMouseEvent, QKeyEvent
 from enum import Enum
 from loguru import logger
+import math
 import time
 
 
+# 按鍵枚舉在熱路徑上解析一次，避免每個事件重複訪問PySide6枚舉屬性
+_LEFT_BUTTON = Qt.MouseButton.LeftButton
+_RIGHT_BUTTON = Qt.MouseButton.RightButton
+
+_LOW_MASK = 0xFFFFFFFF
+_SIGN_BIT = 0x80000000
+
+
+def _pack(x: int, y: int) -> int:
+    """把座標打包成單個整數 (x << 32 | y)，y保留32位補碼以支持負座標"""
+    return (x << 32) | (y & _LOW_MASK)
+
+
+def _unpack(packed: int) -> tuple:
+    """從打包整數還原 (x, y)"""
+    y = packed & _LOW_MASK
+    if y & _SIGN_BIT:
+        y -= 1 << 32
+    return packed >> 32, y
+
+
+def _distance_sq_packed(a: int, b: int) -> int:
+    """計算兩個打包座標間距離的平方"""
+    ax, ay = _unpack(a)
+    bx, by = _unpack(b)
+    dx = ax - bx
+    dy = ay - by
+    return dx * dx + dy * dy
+
+
+# 鼠標狀態機：狀態
+_IDLE = 0       # 未按下
+_PRESSED = 1    # 左鍵按下，尚未超過拖拽閾值
+_DRAGGING = 2   # 拖拽中
+
+# 鼠標狀態機：輸入事件
+_PRESS_LEFT = 0
+_PRESS_RIGHT = 1
+_MOVE = 2
+_RELEASE = 3
+
+
 class EventType(Enum):
     """事件類型枚舉"""
     MOUSE_CLICK = "mouse_click"
@@ -25,12 +68,12 @@ class EventHandler(QObject):
     """事件處理器類"""
     
     # 信號定義
-    click_detected = Signal(QPoint)      # 點擊事件
-    drag_started = Signal(QPoint)        # 拖拽開始
-    drag_moved = Signal(QPoint)          # 拖拽移動
-    drag_finished = Signal(QPoint)       # 拖拽結束
-    double_click = Signal(QPoint)        # 雙擊事件
-    right_click = Signal(QPoint)         # 右鍵點擊
+    click_detected = Signal(int, int)    # 點擊事件
+    drag_started = Signal(int, int)      # 拖拽開始
+    drag_moved = Signal(int, int)        # 拖拽移動
+    drag_finished = Signal(int, int)     # 拖拽結束
+    double_click = Signal(int, int)      # 雙擊事件
+    right_click = Signal(int, int)       # 右鍵點擊
     hover_enter = Signal()               # 鼠標懸停進入
     hover_leave = Signal()               # 鼠標懸停離開
     idle_timeout = Signal()              # 閒置超時
@@ -38,108 +81,183 @@ class EventHandler(QObject):
     def __init__(self):
         super().__init__()
         
-        # 拖拽狀態
-        self.is_dragging = False
+        # 拖拽狀態（座標以_pack打包的整數保存，只在發送信號時拆成x, y）
+        self._state = _IDLE
         self.drag_start_position = None
         self.last_position = None
         
+        # 拖拽移動合併：按屏幕刷新率（約60Hz）只發送最新位置
+        self.drag_coalesce_interval = 16  # 毫秒
+        self._pending_drag_position = None
+        self._drag_coalesce_timer = QTimer()
+        self._drag_coalesce_timer.setSingleShot(True)
+        self._drag_coalesce_timer.setInterval(self.drag_coalesce_interval)
+        self._drag_coalesce_timer.timeout.connect(self._flush_drag)
+        
         # 點擊檢測
         self.click_threshold = 5  # 像素閾值
+        self.click_threshold_sq = self.click_threshold * self.click_threshold  # 與距離平方比較，免去開方
         self.double_click_threshold = 300  # 毫秒
-        self.last_click_time = 0
-        self.last_click_position = None
+        self.last_click = None  # 上次點擊 (事件時間戳毫秒, 打包座標)，一次讀出
+        
+        # 閒置和懸停檢測共用一個單次定時器，按各自的截止時間（monotonic秒）分派
+        self._timer = QTimer()
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._on_timer_timeout)
+        self._armed_deadline = None  # 定時器當前對應的截止時間
         
         # 閒置檢測
-        self.idle_timer = QTimer()
-        self.idle_timer.timeout.connect(self._on_idle_timeout)
         self.idle_timeout_ms = 30000  # 30秒無操作視為閒置
-        self.last_activity_time = time.time()
+        self.last_activity_time = time.monotonic()
+        self._idle_deadline = None
         
         # 懸停檢測
-        self.hover_timer = QTimer()
-        self.hover_timer.setSingleShot(True)
-        self.hover_timer.timeout.connect(self._on_hover_timeout)
         self.hover_delay = 500  # 懸停延遲毫秒
+        self._hover_deadline = None
         
         logger.info("事件處理器初始化完成")
     
+    @staticmethod
+    def _event_position(event: QMouseEvent) -> int:
+        """取得事件的全局座標（打包整數），只訪問一次globalPosition"""
+        pos = event.globalPosition()
+        return _pack(round(pos.x()), round(pos.y()))
+    
+    @property
+    def is_dragging(self) -> bool:
+        """是否正在拖拽"""
+        return self._state == _DRAGGING
+    
+    def _dispatch(self, kind: int, event: QMouseEvent):
+        """按 (當前狀態, 事件) 查表執行轉移，表中沒有的組合直接忽略"""
+        action = self._TRANSITIONS.get((self._state, kind))
+        if action is not None:
+            action(self, event)
+    
     def handle_mouse_press(self, event: QMouseEvent):
         """處理鼠標按下事件"""
-        position = event.globalPosition().toPoint()
-        current_time = time.time() * 1000  # 轉換為毫秒
-        
+        button = event.button()
         self._update_activity()
         
-        if event.button() == Qt.MouseButton.LeftButton:
-            # 檢測雙擊
-            if (self.last_click_position and 
-                self._distance(position, self.last_click_position) < self.click_threshold and
-                current_time - self.last_click_time < self.double_click_threshold):
-                
-                self.double_click.emit(position)
-                logger.info(f"雙擊檢測: {position}")
-                return
-            
-            # 記錄點擊信息
-            self.last_click_time = current_time
-            self.last_click_position = position
-            
-            # 準備拖拽
-            self.drag_start_position = position
-            self.last_position = position
-            
-            self.click_detected.emit(position)
-            logger.debug(f"左鍵點擊: {position}")
-            
-        elif event.button() == Qt.MouseButton.RightButton:
-            self.right_click.emit(position)
-            logger.info(f"右鍵點擊: {position}")
+        if button == _LEFT_BUTTON:
+            self._dispatch(_PRESS_LEFT, event)
+        elif button == _RIGHT_BUTTON:
+            self._dispatch(_PRESS_RIGHT, event)
     
     def handle_mouse_move(self, event: QMouseEvent):
         """處理鼠標移動事件"""
-        if not self.drag_start_position:
-            return
-            
-        current_position = event.globalPosition().toPoint()
+        self._dispatch(_MOVE, event)
+    
+    def handle_mouse_release(self, event: QMouseEvent):
+        """處理鼠標釋放事件"""
+        self._dispatch(_RELEASE, event)
         self._update_activity()
+    
+    def _on_left_press(self, event: QMouseEvent):
+        """左鍵按下：檢測雙擊，否則記錄點擊並準備拖拽"""
+        position = self._event_position(event)
+        current_time = event.timestamp()  # 系統提供的事件時間（毫秒，單調遞增）
+        
+        last_click = self.last_click
+        if (last_click is not None and
+            current_time - last_click[0] < self.double_click_threshold and
+            _distance_sq_packed(position, last_click[1]) < self.click_threshold_sq):
+            
+            point = _unpack(position)
+            self.double_click.emit(*point)
+            logger.info(f"雙擊檢測: {point}")
+            return
         
-        # 檢查是否開始拖拽
-        if not self.is_dragging:
-            distance = self._distance(current_position, self.drag_start_position)
-            if distance > self.click_threshold:
-                self.is_dragging = True
-                self.drag_started.emit(self.drag_start_position)
-                logger.info(f"拖拽開始: {self.drag_start_position}")
+        # 記錄點擊信息
+        self.last_click = (current_time, position)
         
-        # 拖拽中
-        if self.is_dragging:
-            self.drag_moved.emit(current_position)
-            self.last_position = current_position
-            logger.debug(f"拖拽移動: {current_position}")
+        # 準備拖拽
+        self._state = _PRESSED
+        self.drag_start_position = position
+        self.last_position = position
+        
+        point = _unpack(position)
+        self.click_detected.emit(*point)
+        logger.opt(lazy=True).debug("左鍵點擊: {}", lambda: point)
     
-    def handle_mouse_release(self, event: QMouseEvent):
-        """處理鼠標釋放事件"""
-        if self.is_dragging:
-            position = event.globalPosition().toPoint()
-            self.drag_finished.emit(position)
-            logger.info(f"拖拽結束: {position}")
+    def _on_right_press(self, event: QMouseEvent):
+        """右鍵按下"""
+        point = _unpack(self._event_position(event))
+        self.right_click.emit(*point)
+        logger.info(f"右鍵點擊: {point}")
+    
+    def _on_pressed_move(self, event: QMouseEvent):
+        """按下後移動：超過閾值才進入拖拽（閾值內的抖動不算作活動）"""
+        current_position = self._event_position(event)
+        if _distance_sq_packed(current_position, self.drag_start_position) <= self.click_threshold_sq:
+            return
         
-        # 重置拖拽狀態
-        self.is_dragging = False
+        self._state = _DRAGGING
+        start = _unpack(self.drag_start_position)
+        self.drag_started.emit(*start)
+        logger.info(f"拖拽開始: {start}")
+        self._drag_to(current_position)
+    
+    def _on_drag_move(self, event: QMouseEvent):
+        """拖拽中移動"""
+        self._drag_to(self._event_position(event))
+    
+    def _drag_to(self, position: int):
+        """記錄拖拽位置，由合併定時器統一發送"""
+        self._update_activity()
+        self.last_position = position
+        self._pending_drag_position = position
+        if not self._drag_coalesce_timer.isActive():
+            self._drag_coalesce_timer.start()
+        logger.opt(lazy=True).debug("拖拽移動: {}", lambda: _unpack(position))
+    
+    def _on_drag_release(self, event: QMouseEvent):
+        """拖拽中釋放：送出最後位置並結束拖拽"""
+        # 先送出尚未合併發送的最後位置
+        self._flush_drag()
+        position = _unpack(self._event_position(event))
+        self.drag_finished.emit(*position)
+        logger.info(f"拖拽結束: {position}")
+        self._reset_drag()
+    
+    def _reset_drag(self, event: QMouseEvent = None):
+        """重置拖拽狀態"""
+        self._state = _IDLE
         self.drag_start_position = None
         self.last_position = None
-        
-        self._update_activity()
+    
+    # 狀態轉移表：(狀態, 事件) -> 處理方法
+    _TRANSITIONS = {
+        (_IDLE, _PRESS_LEFT): _on_left_press,
+        (_PRESSED, _PRESS_LEFT): _on_left_press,
+        (_IDLE, _PRESS_RIGHT): _on_right_press,
+        (_PRESSED, _PRESS_RIGHT): _on_right_press,
+        (_DRAGGING, _PRESS_RIGHT): _on_right_press,
+        (_PRESSED, _MOVE): _on_pressed_move,
+        (_DRAGGING, _MOVE): _on_drag_move,
+        (_PRESSED, _RELEASE): _reset_drag,
+        (_DRAGGING, _RELEASE): _on_drag_release,
+    }
+    
+    def _flush_drag(self):
+        """發送合併期間最新的拖拽位置"""
+        self._drag_coalesce_timer.stop()
+        position = self._pending_drag_position
+        if position is not None:
+            self._pending_drag_position = None
+            self.drag_moved.emit(*_unpack(position))
     
     def handle_enter_event(self):
         """處理鼠標進入事件"""
-        self.hover_timer.start(self.hover_delay)
+        self._hover_deadline = time.monotonic() + self.hover_delay / 1000
         self._update_activity()
+        self._arm_timer()
         logger.debug("鼠標進入區域")
     
     def handle_leave_event(self):
         """處理鼠標離開事件"""
-        self.hover_timer.stop()
+        # 定時器若仍按懸停截止時間觸發，會在分派時發現無事可做並重新設置
+        self._hover_deadline = None
         self.hover_leave.emit()
         self._update_activity()
         logger.debug("鼠標離開區域")
@@ -157,22 +275,47 @@ class EventHandler(QObject):
         self._update_activity()
         
         # 這裡可以根據需要處理特定按鍵
-        logger.debug(f"按鍵事件: key={key}, modifiers={modifiers}")
-    
-    def _distance(self, point1: QPoint, point2: QPoint) -> float:
-        """計算兩點間距離"""
-        dx = point1.x() - point2.x()
-        dy = point1.y() - point2.y()
-        return (dx * dx + dy * dy) ** 0.5
+        logger.opt(lazy=True).debug("按鍵事件: key={}, modifiers={}", lambda: key, lambda: modifiers)
     
     def _update_activity(self):
         """更新最後活動時間"""
-        self.last_activity_time = time.time()
+        now = time.monotonic()
+        self.last_activity_time = now
+        
+        # 只推遲截止時間，不重啟定時器；定時器提前觸發時再按新的截止時間設置
+        self._idle_deadline = now + self.idle_timeout_ms / 1000
+        if not self._timer.isActive():
+            self._arm_timer()
+    
+    def _arm_timer(self):
+        """把共用定時器設置到最早的截止時間"""
+        deadlines = [d for d in (self._idle_deadline, self._hover_deadline) if d is not None]
+        if not deadlines:
+            self._timer.stop()
+            self._armed_deadline = None
+            return
+        
+        deadline = min(deadlines)
+        if deadline == self._armed_deadline and self._timer.isActive():
+            return
+        self._armed_deadline = deadline
+        self._timer.start(max(0, math.ceil((deadline - time.monotonic()) * 1000)))
+    
+    def _on_timer_timeout(self):
+        """共用定時器回調，分派到已到期的檢測"""
+        self._armed_deadline = None
+        now = time.monotonic()
+        
+        if self._hover_deadline is not None and now >= self._hover_deadline:
+            self._hover_deadline = None
+            self._on_hover_timeout()
+        
+        if self._idle_deadline is not None and now >= self._idle_deadline:
+            # 持續閒置時每個週期再通知一次
+            self._idle_deadline = now + self.idle_timeout_ms / 1000
+            self._on_idle_timeout()
         
-        # 重啟閒置計時器
-        if self.idle_timer.isActive():
-            self.idle_timer.stop()
-        self.idle_timer.start(self.idle_timeout_ms)
+        self._arm_timer()
     
     def _on_idle_timeout(self):
         """閒置超時回調"""
@@ -186,6 +329,7 @@ class EventHandler(QObject):
     def set_click_threshold(self, threshold: int):
         """設置點擊檢測閾值"""
         self.click_threshold = threshold
+        self.click_threshold_sq = threshold * threshold
         
     def set_double_click_threshold(self, threshold: int):
         """設置雙擊檢測閾值"""
@@ -193,16 +337,26 @@ class EventHandler(QObject):
     
     def start_idle_detection(self):
         """開始閒置檢測"""
-        self.idle_timer.start(self.idle_timeout_ms)
+        self._idle_deadline = time.monotonic() + self.idle_timeout_ms / 1000
+        self._arm_timer()
         logger.info("閒置檢測已啟動")
         
     def stop_idle_detection(self):
         """停止閒置檢測"""
-        self.idle_timer.stop()
+        self._idle_deadline = None
+        self._arm_timer()
         logger.info("閒置檢測已停止")
     
     def cleanup(self):
         """清理資源"""
-        self.idle_timer.stop()
-        self.hover_timer.stop()
+        self._timer.stop()
+        self._idle_deadline = None
+        self._hover_deadline = None
+        self._drag_coalesce_timer.stop()
+        self._pending_drag_position = None
+        for signal in (self._timer.timeout, self._drag_coalesce_timer.timeout):
+            try:
+                signal.disconnect()
+            except (TypeError, RuntimeError):
+                pass  # 沒有連接
         logger.info("事件處理器資源已清理")
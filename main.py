@@ -2,20 +2,21 @@
 桌面寵物主程序入口
 整合所有功能模組，提供完整的桌面寵物體驗
 """
-from PySide6.QtWidgets import QApplication
-from PySide6.QtCore import QCoreApplication, Qt
 import sys
 import os
 from loguru import logger
-from ui.main_window import DesktopPetWindow
+
+
+# 必要的資源文件
+ASSETS_PATH = "assets"
+REQUIRED_ASSETS = frozenset({"idle.gif", "move.gif", "dance.gif", "eat.gif", "sleepy.gif", "sleep.gif", "meow.wav"})
 
 
 def setup_logging():
     """設置日誌系統"""
     # 創建日誌目錄
     log_dir = "logs"
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
+    os.makedirs(log_dir, exist_ok=True)
     
     # 配置loguru
     logger.remove()  # 移除默認處理器
@@ -27,7 +28,11 @@ def setup_logging():
         retention="7 days",
         level="INFO",
         format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {name}:{function}:{line} | {message}",
-        encoding="utf-8"
+        encoding="utf-8",
+        enqueue=True,     # 由後台線程寫盤，界面線程只需放入隊列
+        buffering=8192,
+        backtrace=False,  # 異常只記錄本身的堆疊，不展開變量值
+        diagnose=False
     )
     
     # 添加控制台日誌（僅在調試模式下）
@@ -35,7 +40,8 @@ def setup_logging():
         logger.add(
             sys.stderr,
             level="DEBUG",
-            format="<green>{time:HH:mm:ss}</green> | <level>{level}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> | {message}"
+            format="<green>{time:HH:mm:ss}</green> | <level>{level}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> | {message}",
+            enqueue=True
         )
     
     logger.info("日誌系統初始化完成")
@@ -43,15 +49,17 @@ def setup_logging():
 
 def setup_application():
     """設置應用程序"""
+    from PySide6.QtWidgets import QApplication
+    from PySide6.QtCore import QCoreApplication
+    from PySide6.QtGui import QIcon, QPixmap
+    
     # 設置應用程序屬性
     QCoreApplication.setApplicationName("桌面寵物")
     QCoreApplication.setApplicationVersion("1.0.0")
     QCoreApplication.setOrganizationName("Desktop Pet")
     QCoreApplication.setOrganizationDomain("desktop-pet.local")
     
-    # 設置高DPI支持
-    QApplication.setAttribute(Qt.AA_EnableHighDpiScaling, True)
-    QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps, True)
+    # Qt6默認啟用高DPI縮放，無需再設置AA_EnableHighDpiScaling/AA_UseHighDpiPixmaps
     
     # 創建應用程序實例
     app = QApplication(sys.argv)
@@ -60,7 +68,6 @@ def setup_application():
     assets_path = "assets"
     icon_path = os.path.join(assets_path, "idle.gif")
     if os.path.exists(icon_path):
-        from PySide6.QtGui import QIcon, QPixmap
         app.setWindowIcon(QIcon(QPixmap(icon_path)))
     
     # 設置樣式
@@ -72,15 +79,16 @@ def setup_application():
 
 def check_dependencies():
     """檢查必要的依賴和資源"""
-    # 檢查資源文件
-    assets_path = "assets"
-    required_assets = ["idle.gif", "move.gif", "dance.gif", "eat.gif", "sleepy.gif", "sleep.gif", "meow.wav"]
+    # 一次列出資源目錄，代替逐個文件檢查是否存在
+    try:
+        with os.scandir(ASSETS_PATH) as entries:
+            present = {entry.name for entry in entries if entry.is_file()}
+    except OSError as e:
+        logger.warning(f"無法讀取資源目錄: {e}")
+        present = set()
     
-    missing_assets = []
-    for asset in required_assets:
-        asset_path = os.path.join(assets_path, asset)
-        if not os.path.exists(asset_path):
-            missing_assets.append(asset)
+    # 集合差集一次求出缺失項，排序後輸出以保持日誌穩定
+    missing_assets = sorted(REQUIRED_ASSETS.difference(present))
     
     if missing_assets:
         logger.warning(f"缺少資源文件: {missing_assets}")
@@ -102,11 +110,15 @@ def main():
             logger.error("依賴檢查失敗，程序退出")
             return 1
         
+        # 依賴檢查通過後才載入PySide6和主視窗，缺少資源時不必付出Qt的載入時間
+        from PySide6.QtWidgets import QSystemTrayIcon
+        from PySide6.QtCore import QTimer
+        from ui.main_window import DesktopPetWindow
+        
         # 設置應用程序
         app = setup_application()
         
         # 檢查是否支持系統托盤
-        from PySide6.QtWidgets import QSystemTrayIcon
         if not QSystemTrayIcon.isSystemTrayAvailable():
             logger.warning("系統不支持系統托盤功能")
         
@@ -124,7 +136,9 @@ def main():
             logger.info("啟動時隱藏寵物")
         
         if "--start-reminders" in sys.argv:
-            window.pet_controller.start_reminders()
+            # 延後到事件循環開始後執行，不阻塞首幀顯示
+            # 提醒定時器屬於界面線程，不能移到工作線程啟動
+            QTimer.singleShot(0, window.pet_controller.start_reminders)
             logger.info("啟動時開啟定時提醒")
         
         # 確保程序不會因為關閉主窗口而退出
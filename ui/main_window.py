@@ -6,20 +6,97 @@ from PySide6.QtWidgets import (QApplication, QLabel, QSystemTrayIcon,
                                QMenu, QWidget, QVBoxLayout, QHBoxLayout,
                                QPushButton, QSlider, QCheckBox, QSpinBox,
                                QMessageBox, QGroupBox, QColorDialog, QDialog,
-                               QListWidget, QListWidgetItem, QLineEdit, QTextEdit)
-from PySide6.QtGui import QIcon, QPixmap, QAction, QFont, QColor, QPalette
-from PySide6.QtCore import Qt, QPoint, QSize, QTimer, QPropertyAnimation, QEasingCurve
-import sys
+                               QListWidget, QListWidgetItem, QLineEdit)
+from PySide6.QtGui import (QIcon, QPixmap, QAction, QColor, QImageReader, QFontMetrics,
+                           QPainter, QPen)
+from PySide6.QtCore import Qt, QPoint, QTimer, QRectF, Slot
+from collections import OrderedDict
 import os
 from loguru import logger
 from core.controller import PetController
 from utils.config import config_manager
-import json
+
+
+# 消息標籤樣式模板，按字體顏色格式化後緩存
+# 圓角背景和邊框由_MessageLabel預先繪製，padding 10px包含了2px邊框的位置
+_MESSAGE_STYLE_TEMPLATE = """
+            QLabel {{
+                color: {font_color};
+                padding: 10px;
+                font-size: 12px;
+                font-weight: bold;
+                font-family: "Microsoft YaHei", "SimHei", sans-serif;
+            }}
+        """
+_STYLE_CACHE = {}
+
+# 兩側padding（含預繪邊框的2px）的合計，用於由文字尺寸推算標籤尺寸
+_MESSAGE_BOX_MARGIN = 2 * 10
+
+# 消息背景緩存：(邊框顏色, 寬, 高, 設備像素比) -> QPixmap，按最近使用淘汰
+_BACKGROUND_CACHE = OrderedDict()
+_BACKGROUND_CACHE_SIZE = 16
+
+
+def _message_background(border_color: str, width: int, height: int, ratio: float) -> QPixmap:
+    """取得消息的圓角半透明背景，同一顏色和尺寸只繪製一次"""
+    key = (border_color, width, height, ratio)
+    pixmap = _BACKGROUND_CACHE.get(key)
+    if pixmap is not None:
+        _BACKGROUND_CACHE.move_to_end(key)
+        return pixmap
+    
+    pixmap = QPixmap(round(width * ratio), round(height * ratio))
+    pixmap.setDevicePixelRatio(ratio)
+    pixmap.fill(Qt.transparent)
+    
+    painter = QPainter(pixmap)
+    painter.setRenderHint(QPainter.Antialiasing)
+    painter.setPen(QPen(QColor(border_color), 2))
+    painter.setBrush(QColor(255, 255, 255, 220))
+    painter.drawRoundedRect(QRectF(1, 1, width - 2, height - 2), 8, 8)
+    painter.end()
+    
+    _BACKGROUND_CACHE[key] = pixmap
+    if len(_BACKGROUND_CACHE) > _BACKGROUND_CACHE_SIZE:
+        _BACKGROUND_CACHE.popitem(last=False)
+    return pixmap
+
+
+class _MessageLabel(QLabel):
+    """消息標籤，重繪時貼上緩存的背景圖，不再由樣式引擎繪製圓角"""
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._border_color = "#000000"
+    
+    def set_border_color(self, color: str):
+        """設置邊框顏色"""
+        if color != self._border_color:
+            self._border_color = color
+            self.update()
+    
+    def paintEvent(self, event):
+        """先繪製背景，再由QLabel繪製文字"""
+        painter = QPainter(self)
+        painter.drawPixmap(0, 0, _message_background(
+            self._border_color, self.width(), self.height(), self.devicePixelRatioF()))
+        painter.end()
+        super().paintEvent(event)
 
 
 class DesktopPetWindow(QLabel):
     """桌面寵物主視窗類"""
     
+    # 托盤圖標緩存：圖標路徑 -> QIcon，多個窗口實例共用
+    _tray_icon_cache = {}
+    
+    # 托盤菜單中隨狀態切換的文字，動作只創建一次，狀態變化時只改文字
+    _REMINDER_ON_TEXT = "⏰ 停止定時提醒"
+    _REMINDER_OFF_TEXT = "⏰ 開啟定時提醒"
+    _SOUND_ON_TEXT = "🔊 關閉音效"
+    _SOUND_OFF_TEXT = "🔇 開啟音效"
+    
     def __init__(self, assets_path="assets"):
         super().__init__()
         
@@ -32,11 +109,18 @@ class DesktopPetWindow(QLabel):
         self.pet_controller = PetController(assets_path)
         
         # 如果配置中提醒已啟用，則啟動提醒
-        from utils.config import config_manager
         if config_manager.get('reminder_enabled', False):
             self.pet_controller.start_reminders()
             logger.info("根據配置自動啟動提醒功能")
         
+        # 拖拽移動和尺寸變化引起的幾何更新按幀（約60Hz）合併執行
+        self._pending_move = None
+        self._message_position_dirty = False
+        self._frame_timer = QTimer(self)
+        self._frame_timer.setSingleShot(True)
+        self._frame_timer.setInterval(16)
+        self._frame_timer.timeout.connect(self._flush_frame)
+        
         # 消息顯示相關
         self._setup_message_display()
         
@@ -58,29 +142,24 @@ class DesktopPetWindow(QLabel):
         # 拖拽相關
         self.drag_position = None
         
+        # 閃爍效果（托盤單擊時指示寵物位置），每200ms切換一次透明度
+        self._flash_timer = QTimer(self)
+        self._flash_timer.setInterval(200)
+        self._flash_timer.timeout.connect(self._flash_step)
+        self._flash_step_count = 0
+        self._flash_original_opacity = 1.0
+        
         logger.info("桌面寵物主視窗初始化完成")
     
     def _load_window_config(self):
         """載入窗口配置"""
-        from utils.config import config_manager
-        
         # 載入字體和邊框顏色
-        font_color_str = config_manager.get('font_color', '#FFFFFF')
-        border_color_str = config_manager.get('border_color', '#000000')
+        snap = config_manager.snapshot()
         
-        logger.info(f"載入配置 - 字體顏色: {font_color_str}, 邊框顏色: {border_color_str}")
+        # 配置中的顏色為 #RRGGBB 字符串，直接交給QColor解析
+        self.message_font_color = QColor(str(snap['font_color']))
+        self.message_border_color = QColor(str(snap['border_color']))
         
-        # 轉換字符串為QColor對象
-        if isinstance(font_color_str, str):
-            self.message_font_color = QColor(font_color_str)
-        else:
-            self.message_font_color = QColor(255, 255, 255)  # 預設白色
-            
-        if isinstance(border_color_str, str):
-            self.message_border_color = QColor(border_color_str)
-        else:
-            self.message_border_color = QColor(0, 0, 0)  # 預設黑色
-            
         logger.info(f"窗口配置已載入 - 字體: {self.message_font_color.name()}, 邊框: {self.message_border_color.name()}")
     
     def _save_window_config(self):
@@ -95,14 +174,23 @@ class DesktopPetWindow(QLabel):
     def _setup_message_display(self):
         """設置消息顯示組件"""
         # 創建消息標籤作為主窗口的子控件
-        self.message_label = QLabel(self)
+        self.message_label = _MessageLabel(self)
         self.message_label.setWordWrap(True)
         self.message_label.setAlignment(Qt.AlignCenter)
         self.message_label.hide()  # 初始隱藏
         
+        # 消息自動隱藏定時器，重複使用
+        self.message_timer = QTimer(self.message_label)  # 隨消息標籤一同釋放
+        self.message_timer.setSingleShot(True)
+        self.message_timer.timeout.connect(self._hide_message)
+        
         # 設置基本樣式
+        self._last_style_key = None
         self._update_message_style()
         
+        # 子控件總是繪製在父視窗的圖像之上，設置一次層級即可
+        self.message_label.raise_()
+        
         logger.debug("消息顯示組件初始化完成")
     
     def _update_message_style(self):
@@ -110,20 +198,27 @@ class DesktopPetWindow(QLabel):
         font_color = self.message_font_color.name()
         border_color = self.message_border_color.name()
         
-        self.message_label.setStyleSheet(f"""
-            QLabel {{
-                color: {font_color};
-                background-color: rgba(255, 255, 255, 220);
-                border: 2px solid {border_color};
-                border-radius: 8px;
-                padding: 8px;
-                font-size: 12px;
-                font-weight: bold;
-                font-family: "Microsoft YaHei", "SimHei", sans-serif;
-            }}
-        """)
+        # 邊框屬於預繪背景，只需重繪
+        self.message_label.set_border_color(border_color)
         
-        logger.debug(f"消息樣式已更新 - 字體: {font_color}, 邊框: {border_color}")
+        # 字體顏色未變時不重新設置，避免樣式表重新解析和控件重新polish
+        if font_color == self._last_style_key:
+            return
+        
+        style = _STYLE_CACHE.get(font_color)
+        if style is None:
+            style = _MESSAGE_STYLE_TEMPLATE.format(font_color=font_color)
+            _STYLE_CACHE[font_color] = style
+        
+        self.message_label.setStyleSheet(style)
+        self._last_style_key = font_color
+        
+        # 樣式表決定標籤字體，套用後刷新用於計算消息尺寸的字體度量
+        self.message_label.ensurePolished()
+        self._message_metrics = QFontMetrics(self.message_label.font())
+        
+        logger.opt(lazy=True).debug("消息樣式已更新 - 字體: {}, 邊框: {}",
+                                    lambda: font_color, lambda: border_color)
     
     def _update_message_position(self):
         """更新消息標籤位置"""
@@ -137,14 +232,16 @@ class DesktopPetWindow(QLabel):
         # 限制消息寬度不超過寵物寬度
         max_width = pet_width - 20  # 左右各留10像素邊距
         self.message_label.setMaximumWidth(max_width)
-        self.message_label.setWordWrap(True)
         
-        # 重新調整大小以適應內容
-        self.message_label.adjustSize()
+        # 用緩存的字體度量直接計算換行後的文字尺寸，代替adjustSize的完整佈局計算
+        text_rect = self._message_metrics.boundingRect(
+            0, 0, max(1, max_width - _MESSAGE_BOX_MARGIN), 10000,
+            Qt.AlignCenter | Qt.TextWordWrap, self.message_label.text())
+        message_width = min(text_rect.width() + _MESSAGE_BOX_MARGIN, max_width)
+        message_height = text_rect.height() + _MESSAGE_BOX_MARGIN
+        self.message_label.resize(message_width, message_height)
         
         # 計算消息位置：寵物內部上方居中
-        message_width = self.message_label.width()
-        message_height = self.message_label.height()
         
         # 在寵物內部上方顯示，居中對齊
         message_x = (pet_width - message_width) // 2
@@ -157,9 +254,12 @@ class DesktopPetWindow(QLabel):
             message_y = pet_height - message_height - 10
         
         self.message_label.move(message_x, message_y)
-        self.message_label.raise_()  # 確保在最上層
         
-        logger.debug(f"消息位置更新: ({message_x}, {message_y}), 大小: {message_width}x{message_height}, 寵物大小: {pet_width}x{pet_height}")
+        logger.opt(lazy=True).debug(
+            "消息位置更新: {}, 大小: {}, 寵物大小: {}",
+            lambda: (message_x, message_y),
+            lambda: f"{message_width}x{message_height}",
+            lambda: f"{pet_width}x{pet_height}")
     
     def show_message(self, message: str, duration: int = 5000):
         """顯示消息"""
@@ -176,17 +276,12 @@ class DesktopPetWindow(QLabel):
         # 顯示消息
         self.message_label.show()
         
-        # 設置定時隱藏
-        if hasattr(self, 'message_timer'):
-            self.message_timer.stop()
-        else:
-            self.message_timer = QTimer()
-            self.message_timer.timeout.connect(self._hide_message)
-        
+        # 設置定時隱藏（重新計時）
         self.message_timer.start(duration)
         
-        logger.debug(f"消息已顯示，將在 {duration}ms 後隱藏")
+        logger.opt(lazy=True).debug("消息已顯示，將在 {}ms 後隱藏", lambda: duration)
     
+    @Slot()
     def _hide_message(self):
         """隱藏消息"""
         if self.message_label:
@@ -227,11 +322,8 @@ class DesktopPetWindow(QLabel):
         
         # 創建托盤圖標
         tray_icon_path = os.path.join(self.assets_path, "idle.gif")
-        if os.path.exists(tray_icon_path):
-            # 從GIF中提取第一幀作為圖標
-            pixmap = QPixmap(tray_icon_path)
-            icon = QIcon(pixmap.scaled(32, 32, Qt.KeepAspectRatio, Qt.SmoothTransformation))
-        else:
+        icon = self._load_tray_icon(tray_icon_path)
+        if icon is None:
             # 使用系統默認圖標
             icon = self.style().standardIcon(self.style().SP_ComputerIcon)
         
@@ -251,6 +343,40 @@ class DesktopPetWindow(QLabel):
         
         logger.info("系統托盤設置完成")
     
+    @classmethod
+    def _load_tray_icon(cls, icon_path: str):
+        """載入托盤圖標：只按32x32解碼GIF第一幀，結果按路徑緩存"""
+        icon = cls._tray_icon_cache.get(icon_path)
+        if icon is not None:
+            return icon
+        
+        # 新建的讀取器位於第一幀，read()只解碼這一幀；不查詢imageCount以免掃描整個GIF
+        reader = QImageReader(icon_path)
+        if reader.canRead():
+            # 讀取頭部得到原始尺寸，保持寬高比縮放到托盤大小，由解碼器直接輸出目標尺寸
+            size = reader.size()
+            if size.isValid():
+                reader.setScaledSize(size.scaled(32, 32, Qt.KeepAspectRatio))
+            image = reader.read()
+        else:
+            image = None
+        
+        if image is not None and not image.isNull():
+            pixmap = QPixmap.fromImage(image)
+        else:
+            # 讀取器無法處理時退回完整載入
+            logger.warning(f"托盤圖標無法按幀解碼: {reader.errorString()}")
+            pixmap = QPixmap(icon_path)
+            if pixmap.isNull():
+                return None
+        
+        if pixmap.width() > 32 or pixmap.height() > 32:
+            pixmap = pixmap.scaled(32, 32, Qt.KeepAspectRatio, Qt.FastTransformation)
+        
+        icon = QIcon(pixmap)
+        cls._tray_icon_cache[icon_path] = icon
+        return icon
+    
     def _create_tray_menu(self):
         """創建托盤右鍵菜單"""
         self.tray_menu = QMenu()
@@ -268,12 +394,12 @@ class DesktopPetWindow(QLabel):
         self.tray_menu.addAction(settings_action)
         
         # 提醒管理
-        reminder_action = QAction("定時提醒", self)
-        reminder_action.triggered.connect(self._toggle_reminders)
-        self.tray_menu.addAction(reminder_action)
+        self.reminder_action = QAction(self._REMINDER_OFF_TEXT, self)
+        self.reminder_action.triggered.connect(self._toggle_reminders)
+        self.tray_menu.addAction(self.reminder_action)
         
         # 音效開關
-        self.sound_action = QAction("🔊 關閉音效", self)
+        self.sound_action = QAction(self._SOUND_ON_TEXT, self)
         self.sound_action.triggered.connect(self._toggle_sound)
         self.tray_menu.addAction(self.sound_action)
         
@@ -289,17 +415,28 @@ class DesktopPetWindow(QLabel):
         quit_action.triggered.connect(self._quit_application)
         self.tray_menu.addAction(quit_action)
         
+        # 提醒和音效也可能在設置窗口中改變，菜單顯示前同步文字
+        self.tray_menu.aboutToShow.connect(self._sync_tray_actions)
+        
         self.tray_icon.setContextMenu(self.tray_menu)
     
+    @Slot()
+    def _sync_tray_actions(self):
+        """按當前狀態更新托盤菜單中可切換動作的文字"""
+        self.reminder_action.setText(self._REMINDER_ON_TEXT if self.pet_controller.reminder_timer.isActive()
+                                     else self._REMINDER_OFF_TEXT)
+        self.sound_action.setText(self._SOUND_ON_TEXT if self.pet_controller.is_sound_enabled()
+                                  else self._SOUND_OFF_TEXT)
+    
     def _setup_animation_display(self):
         """設置動畫顯示"""
-        movie = self.pet_controller.get_current_movie()
-        if movie:
-            self.setMovie(movie)
-            movie.start()
+        self._current_frame_key = None  # 當前顯示幀的cacheKey
+        frame = self.pet_controller.get_current_frame()
+        if frame:
+            self._show_frame(frame)
             logger.info("動畫顯示設置完成")
         else:
-            logger.warning("無法獲取動畫對象")
+            logger.warning("無法獲取動畫幀")
             # 設置一個佔位符文本，但不設置背景色
             self.setText("🐾")
             self.setAlignment(Qt.AlignCenter)
@@ -312,24 +449,35 @@ class DesktopPetWindow(QLabel):
         self.pet_controller.notification_triggered.connect(self._show_notification)
         self.pet_controller.reminder_message.connect(self._show_reminder_message)  # 使用專門的提醒消息處理方法
         self.pet_controller.feeding_finished.connect(self._on_feeding_finished)  # 連接餵食完成信號
+        self.pet_controller.frame_changed.connect(self._show_frame)  # 動畫幀由控制器推送
     
+    @Slot(QPixmap)
+    def _show_frame(self, pixmap: QPixmap):
+        """顯示動畫幀，與當前顯示的是同一幀時跳過（如單幀動畫或重複切換狀態）"""
+        key = pixmap.cacheKey()
+        if key == self._current_frame_key:
+            return
+        self._current_frame_key = key
+        self.setPixmap(pixmap)
+    
+    @Slot(str)
     def _show_reminder_message(self, message: str):
         """顯示提醒消息（較長顯示時間）"""
         self.show_message(message, 10000)  # 顯示10秒
         logger.info(f"顯示提醒消息: {message}")
     
+    @Slot(str)
     def _on_state_changed(self, state: str):
         """處理狀態變化"""
-        movie = self.pet_controller.get_current_movie()
-        if movie:
-            self.setMovie(movie)
-            movie.start()
-            logger.info(f"視窗動畫已切換到: {state}")
+        if self.pet_controller.get_current_frame():
+            logger.opt(lazy=True).debug("視窗動畫已切換到: {}", lambda: state)
         else:
-            logger.warning(f"無法獲取 {state} 狀態的動畫對象")
+            logger.warning(f"無法獲取 {state} 狀態的動畫幀")
+            self._current_frame_key = None
             self.setText("🐾")
             self.setAlignment(Qt.AlignCenter)
     
+    @Slot(str)
     def _show_notification(self, message: str):
         """顯示系統通知"""
         if hasattr(self, 'tray_icon') and self.tray_icon.isVisible():
@@ -340,6 +488,7 @@ class DesktopPetWindow(QLabel):
                 3000
             )
     
+    @Slot(QSystemTrayIcon.ActivationReason)
     def _on_tray_activated(self, reason):
         """處理托盤圖標激活"""
         if reason == QSystemTrayIcon.DoubleClick:
@@ -349,6 +498,7 @@ class DesktopPetWindow(QLabel):
             if self.isVisible():
                 self._flash_pet()
     
+    @Slot()
     def _toggle_visibility(self):
         """切換寵物顯示/隱藏"""
         if self.isVisible():
@@ -362,18 +512,26 @@ class DesktopPetWindow(QLabel):
     
     def _flash_pet(self):
         """閃爍效果指示寵物位置"""
-        original_opacity = self.windowOpacity()
-        
-        def flash_step(step):
-            if step < 6:  # 閃爍3次
-                opacity = 0.3 if step % 2 == 0 else 1.0
-                self.setWindowOpacity(opacity)
-                QTimer.singleShot(200, lambda: flash_step(step + 1))
-            else:
-                self.setWindowOpacity(original_opacity)
-        
-        flash_step(0)
+        # 閃爍進行中再次觸發時重新開始，但保留最初的透明度
+        if not self._flash_timer.isActive():
+            self._flash_original_opacity = self.windowOpacity()
+        self._flash_step_count = 0
+        self._flash_step()
+    
+    @Slot()
+    def _flash_step(self):
+        """閃爍的單步"""
+        step = self._flash_step_count
+        if step < 6:  # 閃爍3次
+            self.setWindowOpacity(0.3 if step % 2 == 0 else 1.0)
+            self._flash_step_count = step + 1
+            if not self._flash_timer.isActive():
+                self._flash_timer.start()
+        else:
+            self._flash_timer.stop()
+            self.setWindowOpacity(self._flash_original_opacity)
     
+    @Slot()
     def _show_settings(self):
         """顯示設置對話框"""
         # 如果設置窗口已存在且還沒關閉，就直接顯示
@@ -394,6 +552,7 @@ class DesktopPetWindow(QLabel):
         
         logger.info("設置窗口已創建並顯示")
     
+    @Slot()
     def _toggle_reminders(self):
         """切換定時提醒"""
         if self.pet_controller.reminder_timer.isActive():
@@ -405,14 +564,18 @@ class DesktopPetWindow(QLabel):
             self._show_notification("定時提醒已啟動")
             logger.info("通過托盤菜單啟動定時提醒")
     
+    @Slot()
     def _show_about(self):
         """顯示關於信息"""
         self._show_notification("桌面寵物 v1.0 - 陪伴你的桌面小夥伴")
     
+    @Slot()
     def _quit_application(self):
         """退出應用程序"""
         logger.info("正在退出應用程序...")
         self.pet_controller.cleanup()
+        # 寫入仍在延遲中的配置
+        config_manager.flush_now()
         QApplication.quit()
     
     # 事件處理方法
@@ -423,8 +586,10 @@ class DesktopPetWindow(QLabel):
         
         # 記錄拖拽起點
         if event.button() == Qt.LeftButton:
-            self.drag_position = event.globalPosition().toPoint() - self.frameGeometry().topLeft()
-            logger.debug(f"鼠標按下: {event.globalPosition().toPoint()}")
+            # 全局座標只取一次；無邊框視窗的pos()即框架左上角，不必查詢frameGeometry
+            global_pos = event.globalPosition().toPoint()
+            self.drag_position = global_pos - self.pos()
+            logger.opt(lazy=True).debug("鼠標按下: {}", lambda: global_pos)
         
         event.accept()
     
@@ -434,11 +599,12 @@ class DesktopPetWindow(QLabel):
         self.pet_controller.get_event_handler().handle_mouse_move(event)
         
         # 處理視窗拖拽
-        if (event.buttons() & Qt.LeftButton and 
-            self.drag_position is not None):
+        if (self.drag_position is not None and
+            event.buttons() & Qt.LeftButton):
             new_pos = event.globalPosition().toPoint() - self.drag_position
-            self.move(new_pos)
-            logger.debug(f"拖拽移動到: {new_pos}")
+            self._pending_move = new_pos
+            self._schedule_frame()
+            logger.opt(lazy=True).debug("拖拽移動到: {}", lambda: new_pos)
         
         event.accept()
     
@@ -447,9 +613,13 @@ class DesktopPetWindow(QLabel):
         # 處理事件
         self.pet_controller.get_event_handler().handle_mouse_release(event)
         
+        # 立即套用最後一次拖拽位置
+        if self._pending_move is not None:
+            self._flush_frame()
+        
         # 重置拖拽狀態
         if self.drag_position is not None:
-            logger.debug(f"鼠標釋放: {event.globalPosition().toPoint()}")
+            logger.opt(lazy=True).debug("鼠標釋放: {}", lambda: event.globalPosition().toPoint())
             self.drag_position = None
         
         event.accept()
@@ -475,44 +645,68 @@ class DesktopPetWindow(QLabel):
             event.accept()
 
     def _setup_context_menu(self):
-        """設置右鍵上下文菜單"""
+        """設置右鍵上下文菜單（只創建一次，每次右鍵直接顯示）"""
         self.setContextMenuPolicy(Qt.CustomContextMenu)
         self.customContextMenuRequested.connect(self._show_context_menu)
         
-    def _show_context_menu(self, position):
-        """顯示右鍵上下文菜單"""
-        context_menu = QMenu(self)
+        self._context_menu = QMenu(self)
         
         # 設置選項
-        settings_action = context_menu.addAction("⚙️ 設置")
+        settings_action = self._context_menu.addAction("⚙️ 設置")
         settings_action.triggered.connect(self._show_settings)
         
         # 提醒選項
-        reminder_action = context_menu.addAction("🔔 切換提醒")
+        reminder_action = self._context_menu.addAction("🔔 切換提醒")
         reminder_action.triggered.connect(self._toggle_reminders)
         
-        context_menu.addSeparator()
+        self._context_menu.addSeparator()
         
         # 隱藏選項
-        hide_action = context_menu.addAction("👁️ 隱藏寵物")
+        hide_action = self._context_menu.addAction("👁️ 隱藏寵物")
         hide_action.triggered.connect(self.hide)
         
         # 關閉選項
-        quit_action = context_menu.addAction("❌ 退出程序")
+        quit_action = self._context_menu.addAction("❌ 退出程序")
         quit_action.triggered.connect(self._quit_application)
-        
-        # 顯示菜單
-        context_menu.exec(self.mapToGlobal(position))
+    
+    @Slot(QPoint)
+    def _show_context_menu(self, position):
+        """顯示右鍵上下文菜單"""
+        self._context_menu.exec(self.mapToGlobal(position))
 
     def resizeEvent(self, event):
         """視窗大小改變事件"""
         super().resizeEvent(event)
-        self._update_message_position()
+        self._message_position_dirty = True
+        self._schedule_frame()
+    
+    def _schedule_frame(self):
+        """安排在下一幀合併執行幾何更新"""
+        if not self._frame_timer.isActive():
+            self._frame_timer.start()
+    
+    @Slot()
+    def _flush_frame(self):
+        """執行合併的幾何更新：先移動視窗，再更新消息位置"""
+        self._frame_timer.stop()
+        
+        if self._pending_move is not None:
+            new_pos = self._pending_move
+            self._pending_move = None
+            self.move(new_pos)
+        
+        if self._message_position_dirty:
+            self._message_position_dirty = False
+            # 隱藏的消息在下次show_message時會重新定位
+            if self.message_label.isVisible():
+                self._update_message_position()
 
+    @Slot()
     def _on_feeding_finished(self):
         """處理餵食完成"""
         logger.info("餵食動畫播放完成")
 
+    @Slot()
     def _toggle_sound(self):
         """切換音效開關"""
         self.pet_controller.set_sound_enabled(not self.pet_controller.is_sound_enabled())
@@ -528,37 +722,58 @@ class SettingsWindow(QWidget):
         
         # 保存原始設置用於取消操作
         self.original_settings = self._get_current_settings()
+        self._original_values = self._settings_values(self.original_settings)
+        self._just_saved = False  # 剛保存完成，關閉時無需再檢查變更
         
-        logger.info(f"設置窗口初始化 - 讀取到的配置: {self.original_settings}")
+        # 預覽結束後恢復主窗口消息顏色，重複使用同一個定時器
+        self._preview_restore_timer = QTimer(self)
+        self._preview_restore_timer.setSingleShot(True)
+        self._preview_restore_timer.setInterval(3100)
+        self._preview_restore_timer.timeout.connect(self._restore_preview_colors)
+        self._preview_original_colors = None
+        
+        logger.opt(lazy=True).debug("設置窗口初始化 - 讀取到的配置: {}", lambda: self.original_settings)
         
         self._setup_ui()
     
+    # 變更檢測比較的欄位，順序與_current_values一致
+    _SETTINGS_KEYS = ('pet_size', 'reminder_interval', 'reminder_enabled', 'idle_enabled',
+                      'font_color', 'border_color', 'sound_enabled')
+    
+    @classmethod
+    def _settings_values(cls, settings):
+        """按_SETTINGS_KEYS順序取出設置值"""
+        return tuple(settings[key] for key in cls._SETTINGS_KEYS)
+    
+    def _current_values(self):
+        """按_SETTINGS_KEYS順序讀取控件中的值"""
+        return (
+            self.size_slider.value(),
+            self.reminder_spin.value(),
+            self.reminder_checkbox.isChecked(),
+            self.idle_checkbox.isChecked(),
+            self.font_color.name(),  # 使用顏色名稱字符串
+            self.border_color.name(),  # 使用顏色名稱字符串
+            self.sound_checkbox.isChecked()
+        )
+    
     def _get_current_settings(self):
         """獲取當前設置"""
-        from utils.config import config_manager
-        
-        logger.info(f"讀取配置 - 當前配置管理器狀態: {config_manager.config}")
-        
-        # 從配置文件獲取顏色設置
-        font_color_str = config_manager.get('font_color', '#FFFFFF')
-        border_color_str = config_manager.get('border_color', '#000000')
+        # 一次取得配置快照，不再逐項查詢
+        snap = config_manager.snapshot()
         
-        logger.info(f"讀取配置 - 字體顏色: {font_color_str}, 邊框顏色: {border_color_str}")
-        logger.info(f"讀取配置 - 提醒間隔: {config_manager.get('reminder_interval', 30)}")
-        logger.info(f"讀取配置 - 提醒啟用: {config_manager.get('reminder_enabled', False)}")
-        
-        # 轉換為QColor對象
-        font_color = QColor(font_color_str) if isinstance(font_color_str, str) else QColor(255, 255, 255)
-        border_color = QColor(border_color_str) if isinstance(border_color_str, str) else QColor(0, 0, 0)
+        # 顏色統一保存為QColor.name()的格式，變更檢測時直接比較字符串
+        font_color = QColor(str(snap['font_color'])).name()
+        border_color = QColor(str(snap['border_color'])).name()
         
         return {
-            'pet_size': config_manager.get('pet_size', 150),
-            'reminder_interval': config_manager.get('reminder_interval', 30),  # 從配置文件讀取
-            'reminder_enabled': config_manager.get('reminder_enabled', False),  # 從配置文件讀取
-            'idle_enabled': config_manager.get('idle_enabled', True),
+            'pet_size': snap['pet_size'],
+            'reminder_interval': snap['reminder_interval'],  # 從配置文件讀取
+            'reminder_enabled': snap['reminder_enabled'],  # 從配置文件讀取
+            'idle_enabled': snap['idle_enabled'],
             'font_color': font_color,
             'border_color': border_color,
-            'sound_enabled': config_manager.get('sound_enabled', True)  # 從配置文件讀取
+            'sound_enabled': snap['sound_enabled']  # 從配置文件讀取
         }
     
     def _setup_ui(self):
@@ -656,7 +871,7 @@ class SettingsWindow(QWidget):
         self.font_color_btn = QPushButton()
         self.font_color_btn.setFixedSize(50, 30)
         # 主動設置為配置文件中的值
-        self.font_color = self.original_settings['font_color']
+        self.font_color = QColor(self.original_settings['font_color'])
         self.font_color_btn.setStyleSheet(f"background-color: {self.font_color.name()}")
         self.font_color_btn.clicked.connect(self._choose_font_color)
         font_color_layout.addWidget(self.font_color_btn)
@@ -669,7 +884,7 @@ class SettingsWindow(QWidget):
         self.border_color_btn = QPushButton()
         self.border_color_btn.setFixedSize(50, 30)
         # 主動設置為配置文件中的值
-        self.border_color = self.original_settings['border_color']
+        self.border_color = QColor(self.original_settings['border_color'])
         self.border_color_btn.setStyleSheet(f"background-color: {self.border_color.name()}")
         self.border_color_btn.clicked.connect(self._choose_border_color)
         border_color_layout.addWidget(self.border_color_btn)
@@ -704,16 +919,9 @@ class SettingsWindow(QWidget):
         
         self.setLayout(layout)
         
-        # 記錄UI初始化完成和實際顯示的值
-        logger.info(f"UI控件初始化完成:")
-        logger.info(f"  - 寵物大小滑塊值: {self.size_slider.value()}")
-        logger.info(f"  - 提醒間隔數值: {self.reminder_spin.value()}")
-        logger.info(f"  - 提醒啟用checkbox: {self.reminder_checkbox.isChecked()}")
-        logger.info(f"  - 閒置檢測checkbox: {self.idle_checkbox.isChecked()}")
-        logger.info(f"  - 音效checkbox: {self.sound_checkbox.isChecked()}")
-        logger.info(f"  - 字體顏色: {self.font_color.name()}")
-        logger.info(f"  - 邊框顏色: {self.border_color.name()}")
+        logger.debug("設置窗口UI初始化完成")
     
+    @Slot()
     def _choose_font_color(self):
         """選擇字體顏色"""
         color = QColorDialog.getColor(self.font_color, self, "選擇字體顏色")
@@ -721,6 +929,7 @@ class SettingsWindow(QWidget):
             self.font_color = color
             self.font_color_btn.setStyleSheet(f"background-color: {color.name()}")
     
+    @Slot()
     def _choose_border_color(self):
         """選擇邊框顏色"""
         color = QColorDialog.getColor(self.border_color, self, "選擇邊框顏色")
@@ -728,12 +937,14 @@ class SettingsWindow(QWidget):
             self.border_color = color
             self.border_color_btn.setStyleSheet(f"background-color: {color.name()}")
     
+    @Slot()
     def _preview_message(self):
         """預覽消息效果"""
         if self.main_window:
-            # 臨時應用當前設置
-            original_font_color = self.main_window.message_font_color
-            original_border_color = self.main_window.message_border_color
+            # 臨時應用當前設置；預覽進行中時保留最初的顏色
+            if not self._preview_restore_timer.isActive():
+                self._preview_original_colors = (self.main_window.message_font_color,
+                                                 self.main_window.message_border_color)
             
             self.main_window.message_font_color = self.font_color
             self.main_window.message_border_color = self.border_color
@@ -743,102 +954,48 @@ class SettingsWindow(QWidget):
             self.main_window.show_message("這是消息預覽效果", 3000)
             
             # 恢復原始設置
-            QTimer.singleShot(3100, lambda: self._restore_preview_colors(original_font_color, original_border_color))
+            self._preview_restore_timer.start()
     
-    def _restore_preview_colors(self, original_font_color, original_border_color):
+    @Slot()
+    def _restore_preview_colors(self):
         """恢復預覽前的顏色設置"""
-        if self.main_window:
-            self.main_window.message_font_color = original_font_color
-            self.main_window.message_border_color = original_border_color
+        self._preview_restore_timer.stop()
+        if self.main_window and self._preview_original_colors is not None:
+            (self.main_window.message_font_color,
+             self.main_window.message_border_color) = self._preview_original_colors
+            self._preview_original_colors = None
             self.main_window._update_message_style()
     
     def _has_changes(self):
         """檢查是否有設置變更"""
         try:
-            # 檢查UI組件是否還存在
-            if not hasattr(self, 'size_slider') or self.size_slider is None:
-                logger.debug("UI組件不存在，返回無變更")
-                return False
-            if not hasattr(self, 'reminder_spin') or self.reminder_spin is None:
-                logger.debug("reminder_spin不存在，返回無變更")
-                return False
-            if not hasattr(self, 'reminder_checkbox') or self.reminder_checkbox is None:
-                logger.debug("reminder_checkbox不存在，返回無變更")
+            # 控件在__init__中創建，能關閉窗口時必然存在
+            # 原始值預先存為元組，一次元組比較即可，不再構建字典
+            current = self._current_values()
+            original = self._original_values
+            if current == original:
                 return False
-            if not hasattr(self, 'idle_checkbox') or self.idle_checkbox is None:
-                logger.debug("idle_checkbox不存在，返回無變更")
-                return False
-            if not hasattr(self, 'sound_checkbox') or self.sound_checkbox is None:
-                logger.debug("sound_checkbox不存在，返回無變更")
-                return False
-            
-            current = {
-                'pet_size': self.size_slider.value(),
-                'reminder_interval': self.reminder_spin.value(),
-                'reminder_enabled': self.reminder_checkbox.isChecked(),
-                'idle_enabled': self.idle_checkbox.isChecked(),
-                'font_color': self.font_color.name(),  # 使用顏色名稱字符串
-                'border_color': self.border_color.name(),  # 使用顏色名稱字符串
-                'sound_enabled': self.sound_checkbox.isChecked()
-            }
-            
-            # 將原始設置中的顏色也轉換為字符串進行比較
-            original_font_color = self.original_settings['font_color'].name() if hasattr(self.original_settings['font_color'], 'name') else str(self.original_settings['font_color'])
-            original_border_color = self.original_settings['border_color'].name() if hasattr(self.original_settings['border_color'], 'name') else str(self.original_settings['border_color'])
-            
-            logger.info(f"變更檢測 - 當前UI值: {current}")
-            logger.info(f"變更檢測 - 原始設置字體顏色: {original_font_color}, 邊框顏色: {original_border_color}")
-            
-            has_changes = (current['pet_size'] != self.original_settings['pet_size'] or
-                    current['reminder_interval'] != self.original_settings['reminder_interval'] or
-                    current['reminder_enabled'] != self.original_settings['reminder_enabled'] or
-                    current['idle_enabled'] != self.original_settings['idle_enabled'] or
-                    current['font_color'] != original_font_color or
-                    current['border_color'] != original_border_color or
-                    current['sound_enabled'] != self.original_settings['sound_enabled'])
             
-            logger.info(f"變更檢測結果: {has_changes}")
-            
-            if has_changes:
-                logger.info("檢測到的具體變更:")
-                if current['pet_size'] != self.original_settings['pet_size']:
-                    logger.info(f"  - 寵物大小: {self.original_settings['pet_size']} -> {current['pet_size']}")
-                if current['reminder_interval'] != self.original_settings['reminder_interval']:
-                    logger.info(f"  - 提醒間隔: {self.original_settings['reminder_interval']} -> {current['reminder_interval']}")
-                if current['reminder_enabled'] != self.original_settings['reminder_enabled']:
-                    logger.info(f"  - 提醒啟用: {self.original_settings['reminder_enabled']} -> {current['reminder_enabled']}")
-                if current['idle_enabled'] != self.original_settings['idle_enabled']:
-                    logger.info(f"  - 閒置檢測: {self.original_settings['idle_enabled']} -> {current['idle_enabled']}")
-                if current['font_color'] != original_font_color:
-                    logger.info(f"  - 字體顏色: {original_font_color} -> {current['font_color']}")
-                if current['border_color'] != original_border_color:
-                    logger.info(f"  - 邊框顏色: {original_border_color} -> {current['border_color']}")
-                if current['sound_enabled'] != self.original_settings['sound_enabled']:
-                    logger.info(f"  - 音效啟用: {self.original_settings['sound_enabled']} -> {current['sound_enabled']}")
-            
-            return has_changes
+            logger.opt(lazy=True).debug("檢測到的設置變更 (原值, 新值): {}", lambda: {
+                key: (old, new) for key, old, new in zip(self._SETTINGS_KEYS, original, current)
+                if old != new})
+            return True
             
         except RuntimeError:
             # UI組件已被刪除，視為無變更
             logger.debug("UI組件運行時錯誤，返回無變更")
             return False
     
+    @Slot()
     def _save_settings(self):
         """保存設置"""
         try:
-            logger.info("=== 開始保存設置流程 ===")
-            
             # 檢查UI組件是否還存在
             if not hasattr(self, 'size_slider') or self.size_slider is None:
                 logger.warning("UI組件已被刪除，無法保存設置")
                 self.close()
                 return
             
-            logger.info("UI組件檢查通過")
-            
-            # 直接保存，不再詢問確認
-            logger.info("開始保存設置...")
-            
             # 獲取當前UI中的值
             pet_size = self.size_slider.value()
             reminder_interval = self.reminder_spin.value()
@@ -848,12 +1005,6 @@ class SettingsWindow(QWidget):
             font_color_name = self.font_color.name()
             border_color_name = self.border_color.name()
             
-            logger.info(f"UI中的值 - 寵物大小: {pet_size}, 提醒間隔: {reminder_interval}分鐘")
-            logger.info(f"UI中的值 - 提醒啟用: {reminder_enabled}, 閒置檢測: {idle_enabled}, 音效: {sound_enabled}")
-            logger.info(f"UI中的值 - 字體顏色: {font_color_name}, 邊框顏色: {border_color_name}")
-            
-            # 使用簡單直接的方法保存配置
-            settings_path = "config.json"
             settings = {
                 "pet_size": pet_size,
                 "reminder_interval": reminder_interval,
@@ -862,72 +1013,52 @@ class SettingsWindow(QWidget):
                 "sound_enabled": sound_enabled,
                 "font_color": font_color_name,
                 "border_color": border_color_name,
-                "reminder_messages": [
-                    "該休息一下眼睛了！",
-                    "記得保持良好的坐姿哦～",
-                    "喝點水，保持水分！",
-                    "起來走動走動吧！",
-                    "深呼吸，放松一下～",
-                    "記得活動手腕和頸部！"
-                ]
+                "reminder_messages": self.pet_controller.reminder_messages
             }
             
-            logger.info(f"準備保存的設置: {settings}")
+            # 內存中的settings即為寫入內容，只在調試時才格式化輸出；各步驟不再逐條記錄
+            logger.opt(lazy=True).debug("準備保存的設置: {}", lambda: settings)
             
             try:
-                # 直接保存配置文件
-                with open(settings_path, "w", encoding="utf-8") as f:
-                    json.dump(settings, f, indent=4, ensure_ascii=False)
-                logger.info("配置文件保存成功")
-                
-                # 驗證保存結果
-                if os.path.exists(settings_path):
-                    with open(settings_path, "r", encoding="utf-8") as f:
-                        saved_data = json.load(f)
-                    logger.info(f"驗證保存結果: {saved_data}")
-                
-                # 同時更新配置管理器
-                from utils.config import config_manager
-                config_manager.config.update(settings)
-                logger.info("配置管理器已同步更新")
+                # 用戶主動保存時立即寫入，失敗時由下方的對話框報告
+                config_manager.update(settings)
+                if not config_manager.save_config(immediate=True):
+                    raise OSError("無法寫入配置文件，詳見日誌")
                 
                 # 應用設置到控制器
                 self.pet_controller.set_pet_size(pet_size, pet_size)
-                logger.info(f"寵物大小已應用: {pet_size}")
                 
                 self.pet_controller.set_reminder_interval(reminder_interval)
-                logger.info(f"提醒間隔已應用: {reminder_interval}分鐘")
                 
                 if reminder_enabled:
                     self.pet_controller.start_reminders()
-                    logger.info("提醒功能已啟動")
                 else:
                     self.pet_controller.stop_reminders()
-                    logger.info("提醒功能已停止")
                 
                 if idle_enabled:
                     self.pet_controller.get_event_handler().start_idle_detection()
-                    logger.info("閒置檢測已啟動")
                 else:
                     self.pet_controller.get_event_handler().stop_idle_detection()
-                    logger.info("閒置檢測已停止")
                 
                 # 設置音效
                 self.pet_controller.set_sound_enabled(sound_enabled)
-                logger.info(f"音效設置已應用: {sound_enabled}")
                 
                 # 應用外觀設置到主窗口
                 if self.main_window:
+                    # 已保存的顏色即為新的基準，不再恢復預覽前的顏色
+                    self._preview_restore_timer.stop()
+                    self._preview_original_colors = None
                     self.main_window.message_font_color = self.font_color
                     self.main_window.message_border_color = self.border_color
                     self.main_window._update_message_style()
-                    logger.info("外觀設置已應用到主窗口")
                 
-                logger.info("=== 設置保存流程完成 ===")
+                logger.info("設置已保存並應用")
                 self._show_notification("設置已保存")
                 
                 # 更新原始設置，避免關閉時再次詢問
                 self.original_settings = self._get_current_settings()
+                self._original_values = self._settings_values(self.original_settings)
+                self._just_saved = True
                 
                 # 保存成功後自動關閉窗口
                 self.close()
@@ -943,6 +1074,7 @@ class SettingsWindow(QWidget):
             import traceback
             logger.error(f"錯誤堆疊: {traceback.format_exc()}")
     
+    @Slot()
     def _cancel_settings(self):
         """取消設置"""
         try:
@@ -955,7 +1087,8 @@ class SettingsWindow(QWidget):
     def closeEvent(self, event):
         """關閉事件"""
         try:
-            if self._has_changes():
+            # 剛保存完成時控件值即為原始值，不必再逐項讀取比較
+            if not self._just_saved and self._has_changes():
                 reply = QMessageBox.question(self, "關閉設置", 
                                            "您有未保存的更改，是否要保存？",
                                            QMessageBox.Save | QMessageBox.Discard | QMessageBox.Cancel,
@@ -972,6 +1105,10 @@ class SettingsWindow(QWidget):
             else:
                 event.accept()
             
+            # 預覽尚未結束時立即恢復顏色，窗口釋放後定時器不再觸發
+            if self._preview_restore_timer.isActive():
+                self._restore_preview_colors()
+            
             # 清理主窗口中的設置窗口引用
             if self.main_window and hasattr(self.main_window, 'settings_window'):
                 self.main_window.settings_window = None
@@ -986,6 +1123,7 @@ class SettingsWindow(QWidget):
             if self.main_window and hasattr(self.main_window, 'settings_window'):
                 self.main_window.settings_window = None
     
+    @Slot()
     def _feed_pet(self):
         """處理餵食寵物"""
         self.pet_controller.feed_pet()
@@ -995,6 +1133,7 @@ class SettingsWindow(QWidget):
         if self.main_window:
             self.main_window.show_message(message)
 
+    @Slot()
     def _manage_reminder_messages(self):
         """管理提醒消息"""
         dialog = ReminderMessagesDialog(self.pet_controller, self)
@@ -1031,8 +1170,7 @@ class ReminderMessagesDialog(QDialog):
         # 新消息輸入
         input_layout = QVBoxLayout()
         input_layout.addWidget(QLabel("新消息："))
-        self.message_input = QTextEdit()
-        self.message_input.setMaximumHeight(80)
+        self.message_input = QLineEdit()
         self.message_input.setPlaceholderText("輸入新的提醒消息...")
         input_layout.addWidget(self.message_input)
         layout.addLayout(input_layout)
@@ -1065,15 +1203,25 @@ class ReminderMessagesDialog(QDialog):
         layout.addLayout(button_layout)
     
     def _update_message_list(self):
-        """更新消息列表"""
-        self.message_list.clear()
+        """更新消息列表（重用現有項目，只增刪數量差並更新文字）"""
+        message_list = self.message_list
+        count = len(self.messages)
+        
+        # 暫停重繪，所有修改完成後只重繪一次
+        message_list.setUpdatesEnabled(False)
+        while message_list.count() < count:
+            message_list.addItem(QListWidgetItem())
+        while message_list.count() > count:
+            # takeItem移出後由Python端持有，離開作用域即釋放
+            message_list.takeItem(message_list.count() - 1)
         for i, message in enumerate(self.messages):
-            item = QListWidgetItem(f"{i+1}. {message}")
-            self.message_list.addItem(item)
+            message_list.item(i).setText(f"{i+1}. {message}")
+        message_list.setUpdatesEnabled(True)
     
+    @Slot()
     def _add_message(self):
         """添加新消息"""
-        message = self.message_input.toPlainText().strip()
+        message = self.message_input.text().strip()
         if not message:
             QMessageBox.warning(self, "錯誤", "請輸入消息內容！")
             return
@@ -1086,6 +1234,7 @@ class ReminderMessagesDialog(QDialog):
         self.message_input.clear()
         self._update_message_list()
     
+    @Slot()
     def _delete_message(self):
         """刪除選中的消息"""
         current_row = self.message_list.currentRow()
@@ -1100,6 +1249,7 @@ class ReminderMessagesDialog(QDialog):
         else:
             QMessageBox.warning(self, "錯誤", "請先選擇要刪除的消息！")
     
+    @Slot()
     def _save_messages(self):
         """保存消息"""
         if not self.messages:
@@ -1107,8 +1257,7 @@ class ReminderMessagesDialog(QDialog):
             return
         
         # 更新控制器中的消息
-        self.pet_controller.reminder_messages = self.messages
-        self.pet_controller.current_reminder_index = 0
+        self.pet_controller.set_reminder_messages(self.messages)
         
         QMessageBox.information(self, "成功", "提醒消息已保存！")
         self.accept()
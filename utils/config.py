@@ -5,60 +5,139 @@
 import json
 import os
 from pathlib import Path
+from types import MappingProxyType
+from PySide6.QtCore import QCoreApplication, QTimer
 from loguru import logger
 
+try:
+    import orjson
+except ImportError:  # 未安裝orjson時退回標準庫json
+    orjson = None
+
+
+def dump_json(data) -> bytes:
+    """序列化為UTF-8編碼的JSON（縮進2格）"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def load_json(data: bytes):
+    """解析UTF-8編碼的JSON"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# 只同步文件數據，不支持fdatasync的平台退回fsync
+_sync_data = getattr(os, 'fdatasync', os.fsync)
+
+
+# 預設配置，只讀；載入時與配置文件內容合並
+# 序列欄位存為元組，避免被取出後原地修改而改變預設值
+_DEFAULT_CONFIG = {
+    'pet_size': 150,
+    'reminder_interval': 30,  # 分鐘
+    'reminder_enabled': False,
+    'idle_enabled': True,
+    'sound_enabled': True,
+    'font_color': '#FFFFFF',
+    'border_color': '#000000',
+    'reminder_messages': (
+        "該休息一下眼睛了！",
+        "記得保持良好的坐姿哦～",
+        "喝點水，保持水分！",
+        "起來走動走動吧！",
+        "深呼吸，放松一下～",
+        "記得活動手腕和頸部！"
+    )
+}
+DEFAULT_CONFIG = MappingProxyType(_DEFAULT_CONFIG)
+
+
+def _default_config_copy():
+    """預設配置的可修改副本，序列欄位轉為新的列表"""
+    config = dict(_DEFAULT_CONFIG)
+    config['reminder_messages'] = list(_DEFAULT_CONFIG['reminder_messages'])
+    return config
+
 
 class ConfigManager:
     """配置管理器"""
     
+    # 保存請求合並寫入的延遲（毫秒）
+    SAVE_DELAY_MS = 500
+    
     def __init__(self, config_file="config.json"):
         self.config_file = config_file
         self.config_path = Path(config_file)
-        self.default_config = {
-            'pet_size': 150,
-            'reminder_interval': 30,  # 分鐘
-            'reminder_enabled': False,
-            'idle_enabled': True,
-            'sound_enabled': True,
-            'font_color': '#FFFFFF',
-            'border_color': '#000000',
-            'reminder_messages': [
-                "該休息一下眼睛了！",
-                "記得保持良好的坐姿哦～",
-                "喝點水，保持水分！",
-                "起來走動走動吧！",
-                "深呼吸，放松一下～",
-                "記得活動手腕和頸部！"
-            ]
-        }
+        self.default_config = DEFAULT_CONFIG
+        self._snapshot = None  # 配置快照，配置變更時失效
+        self._dirty = False
+        self._flush_timer = None  # 首次保存時創建，此時QApplication已存在
         self.config = self.load_config()
     
     def load_config(self):
         """載入配置"""
         try:
             if self.config_path.exists():
-                with open(self.config_path, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-                    # 合並預設配置，確保所有欄位都存在
-                    merged_config = self.default_config.copy()
-                    merged_config.update(config)
-                    logger.info(f"配置文件載入成功: {self.config_path}")
-                    return merged_config
+                # 合並預設配置，確保所有欄位都存在
+                config = {**_default_config_copy(), **load_json(self.config_path.read_bytes())}
+                logger.info(f"配置文件載入成功: {self.config_path}")
+                return config
             else:
                 logger.info("配置文件不存在，使用預設配置")
-                return self.default_config.copy()
+                return _default_config_copy()
         except Exception as e:
             logger.error(f"載入配置文件失敗: {e}，使用預設配置")
-            return self.default_config.copy()
+            return _default_config_copy()
     
-    def save_config(self):
-        """保存配置"""
+    def save_config(self, immediate=False):
+        """保存配置
+        
+        預設只標記待保存，短時間內的多次保存合並為一次寫入，返回True；
+        immediate為True時立即寫入並返回寫入結果，供需要向用戶報告失敗的調用方使用。
+        """
+        self._dirty = True
+        self._snapshot = None
+        
+        app = QCoreApplication.instance()
+        if immediate or app is None:
+            # 沒有事件循環時無法延遲，直接寫入
+            return self.flush_now()
+        
+        if self._flush_timer is None:
+            self._flush_timer = QTimer(app)
+            self._flush_timer.setSingleShot(True)
+            self._flush_timer.timeout.connect(self._flush)
+            # 無論程序以何種方式結束事件循環，都先寫入仍在延遲中的配置
+            app.aboutToQuit.connect(self.flush_now)
+        self._flush_timer.start(self.SAVE_DELAY_MS)
+        return True
+    
+    def flush_now(self):
+        """立即寫入待保存的配置，返回是否成功（無待保存內容時返回True）"""
+        if self._flush_timer is not None:
+            self._flush_timer.stop()
+        if not self._dirty:
+            return True
+        return self._flush()
+    
+    def _flush(self):
+        """將配置寫入文件"""
         try:
             # 確保配置目錄存在
             self.config_path.parent.mkdir(parents=True, exist_ok=True)
             
-            with open(self.config_path, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, ensure_ascii=False, indent=2)
+            # 先寫臨時文件再原子替換，中途崩潰也不會留下寫了一半的配置
+            tmp_path = self.config_path.with_suffix('.json.tmp')
+            with open(tmp_path, 'wb') as f:
+                f.write(dump_json(self.config))
+                f.flush()
+                # 替換前確保內容已落盤；fdatasync不同步無關的元數據（Windows上只有fsync）
+                _sync_data(f.fileno())
+            os.replace(tmp_path, self.config_path)
+            self._dirty = False
             logger.info(f"配置文件保存成功: {self.config_path}")
             logger.debug(f"保存的配置內容: {self.config}")
             return True
@@ -70,17 +149,26 @@ class ConfigManager:
         """獲取配置值"""
         return self.config.get(key, default)
     
+    def snapshot(self):
+        """獲取當前配置的快照（只讀），一次讀取多個值時使用"""
+        if self._snapshot is None:
+            self._snapshot = dict(self.config)
+        return self._snapshot
+    
     def set(self, key, value):
         """設置配置值"""
         self.config[key] = value
+        self._snapshot = None
     
     def update(self, updates):
         """批量更新配置"""
         self.config.update(updates)
+        self._snapshot = None
     
     def reset_to_default(self):
         """重置為預設配置"""
-        self.config = self.default_config.copy()
+        self.config = _default_config_copy()
+        self._snapshot = None
         logger.info("配置已重置為預設值")
 
 
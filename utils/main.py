@@ -1,16 +1,28 @@
 from PySide6.QtWidgets import QApplication, QLabel
 from PySide6.QtGui import QMovie
-from PySide6.QtCore import Qt, QPoint, QSize
+from PySide6.QtCore import Qt, QPoint, QSize, QTimer
 import sys
 
 class DesktopPet(QLabel):
     def __init__(self):
         super().__init__()
 
-        # 載入動畫
-        self.movie = QMovie("assets/test.gif")  # 替換為你的 GIF 檔
-        self.movie.setScaledSize(QSize(150, 150))   # 縮放尺寸
-        self.setMovie(self.movie)
+        # 載入動畫：啟動時一次性解碼並縮放所有幀，播放時只切換QPixmap
+        movie = QMovie("assets/test.gif")  # 替換為你的 GIF 檔
+        movie.setScaledSize(QSize(150, 150))   # 縮放尺寸
+        self.frames = []
+        self.frame_delays = []
+        for i in range(movie.frameCount()):
+            if not movie.jumpToFrame(i):
+                break
+            self.frames.append(movie.currentPixmap())
+            self.frame_delays.append(movie.nextFrameDelay() or 50)
+        self.frame_index = 0
+
+        # 按每幀的延遲推進動畫
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setSingleShot(True)
+        self.frame_timer.timeout.connect(self.next_frame)
 
         # 設定無邊框 + 透明背景 + 最上層
         self.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.SubWindow)
@@ -18,10 +30,24 @@ class DesktopPet(QLabel):
         self.resize(150, 150)
 
         # 開始動畫
-        self.movie.start()
+        if self.frames:
+            self.setPixmap(self.frames[0])
+            self.frame_timer.start(self.frame_delays[0])
 
         self.drag_position = None  # 拖曳起點位置
 
+        # 拖曳時合並同一幀內的多次移動，每幀最多移動窗口一次
+        self.pending_position = None
+        self.move_timer = QTimer(self)
+        self.move_timer.setSingleShot(True)
+        self.move_timer.setInterval(16)
+        self.move_timer.timeout.connect(self.flush_move)
+
+    def next_frame(self):
+        self.frame_index = (self.frame_index + 1) % len(self.frames)
+        self.setPixmap(self.frames[self.frame_index])
+        self.frame_timer.start(self.frame_delays[self.frame_index])
+
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
             self.drag_position = event.globalPosition().toPoint() - self.frameGeometry().topLeft()
@@ -29,9 +55,21 @@ class DesktopPet(QLabel):
 
     def mouseMoveEvent(self, event):
         if event.buttons() & Qt.LeftButton and self.drag_position:
-            self.move(event.globalPosition().toPoint() - self.drag_position)
+            self.pending_position = event.globalPosition().toPoint() - self.drag_position
+            if not self.move_timer.isActive():
+                self.move_timer.start()
             event.accept()
 
+    def mouseReleaseEvent(self, event):
+        # 放開時立即移到最終位置
+        self.flush_move()
+
+    def flush_move(self):
+        self.move_timer.stop()
+        if self.pending_position is not None:
+            self.move(self.pending_position)
+            self.pending_position = None
+
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     pet = DesktopPet()
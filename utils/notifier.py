@@ -5,19 +5,22 @@
 from PySide6.QtWidgets import QSystemTrayIcon, QApplication
 from PySide6.QtCore import QObject, Signal, QTimer
 from loguru import logger
-import platform
-import subprocess
 import os
-from datetime import datetime, timedelta
-from enum import Enum
+import heapq
+import time
+import base64
+from collections import deque
+from itertools import islice, cycle
+from datetime import datetime, time as day_time
+from enum import Enum, IntEnum
 
 
-class NotificationType(Enum):
-    """通知類型枚舉"""
-    INFO = "info"
-    WARNING = "warning"
-    ERROR = "error"
-    REMINDER = "reminder"
+class NotificationType(IntEnum):
+    """通知類型枚舉（值從0連續編號，用作_QT_ICON_TABLE的索引）"""
+    INFO = 0
+    WARNING = 1
+    ERROR = 2
+    REMINDER = 3
 
 
 class NotificationPriority(Enum):
@@ -28,23 +31,59 @@ class NotificationPriority(Enum):
     URGENT = 4
 
 
+# 各通知類型對應的托盤圖標，按NotificationType的值排列
+_QT_ICON_TABLE = (
+    QSystemTrayIcon.MessageIcon.Information,  # INFO
+    QSystemTrayIcon.MessageIcon.Warning,      # WARNING
+    QSystemTrayIcon.MessageIcon.Critical,     # ERROR
+    QSystemTrayIcon.MessageIcon.Information   # REMINDER
+)
+
+
 class CrossPlatformNotifier(QObject):
     """跨平台通知器"""
     
     notification_clicked = Signal(str)  # 通知被點擊
     notification_shown = Signal(str)    # 通知已顯示
     
+    # PowerShell氣泡通知腳本，標題和內容經環境變量傳入，不拼接進腳本，避免引號轉義問題
+    _PS_SCRIPT = """
+        Add-Type -AssemblyName System.Windows.Forms
+        $balloon = New-Object System.Windows.Forms.NotifyIcon
+        $balloon.Icon = [System.Drawing.SystemIcons]::Information
+        $balloon.BalloonTipIcon = "Info"
+        $balloon.BalloonTipText = $env:DESKTOP_PET_NOTIFY_MESSAGE
+        $balloon.BalloonTipTitle = $env:DESKTOP_PET_NOTIFY_TITLE
+        $balloon.Visible = $true
+        $balloon.ShowBalloonTip(5000)
+        """
+    # -EncodedCommand要求UTF-16LE的base64，只編碼一次
+    _PS_ENCODED = base64.b64encode(_PS_SCRIPT.encode("utf-16-le")).decode("ascii")
+    
     def __init__(self, app_name="桌面寵物"):
         super().__init__()
         self.app_name = app_name
+        import platform
         self.platform = platform.system().lower()
         self.tray_icon = None
+        self._tray_supports_messages = False
+        self._toaster = None  # win10toast.ToastNotifier，首次使用時創建；False表示不可用
+        self._children = []   # 尚未回收的通知子進程
+        
+        # 原生通知按平台只查表一次
+        self._show_native = {
+            "windows": self._show_windows_notification,
+            "darwin": self._show_macos_notification,  # macOS
+            "linux": self._show_linux_notification
+        }.get(self.platform)
         
         logger.info(f"通知器初始化完成 - 平台: {self.platform}")
     
     def set_tray_icon(self, tray_icon: QSystemTrayIcon):
         """設置系統托盤圖標"""
         self.tray_icon = tray_icon
+        # 平台能力在運行期間不變，設置托盤時查詢一次
+        self._tray_supports_messages = QSystemTrayIcon.supportsMessages()
     
     def show_notification(self, title: str, message: str, 
                          notification_type: NotificationType = NotificationType.INFO,
@@ -65,8 +104,8 @@ class CrossPlatformNotifier(QObject):
     def _use_qt_notification(self) -> bool:
         """判斷是否使用Qt通知"""
         return (self.tray_icon is not None and 
-                self.tray_icon.isVisible() and 
-                QSystemTrayIcon.supportsMessages())
+                self._tray_supports_messages and 
+                self.tray_icon.isVisible())
     
     def _show_qt_notification(self, title: str, message: str, 
                              notification_type: NotificationType, duration: int):
@@ -76,57 +115,49 @@ class CrossPlatformNotifier(QObject):
     
     def _get_qt_icon_type(self, notification_type: NotificationType):
         """獲取Qt通知圖標類型"""
-        type_map = {
-            NotificationType.INFO: QSystemTrayIcon.MessageIcon.Information,
-            NotificationType.WARNING: QSystemTrayIcon.MessageIcon.Warning,
-            NotificationType.ERROR: QSystemTrayIcon.MessageIcon.Critical,
-            NotificationType.REMINDER: QSystemTrayIcon.MessageIcon.Information
-        }
-        return type_map.get(notification_type, QSystemTrayIcon.MessageIcon.Information)
+        # 表外的值（如直接傳入的整數）退回資訊圖標，不在通知路徑上拋出IndexError
+        if 0 <= notification_type < len(_QT_ICON_TABLE):
+            return _QT_ICON_TABLE[notification_type]
+        return QSystemTrayIcon.MessageIcon.Information
     
     def _show_native_notification(self, title: str, message: str,
                                  notification_type: NotificationType, duration: int):
         """顯示原生系統通知"""
-        if self.platform == "windows":
-            self._show_windows_notification(title, message, duration)
-        elif self.platform == "darwin":  # macOS
-            self._show_macos_notification(title, message, duration)
-        elif self.platform == "linux":
-            self._show_linux_notification(title, message, duration)
+        if self._show_native is not None:
+            self._show_native(title, message, duration)
         else:
             logger.warning(f"不支持的平台: {self.platform}")
     
     def _show_windows_notification(self, title: str, message: str, duration: int):
         """Windows原生通知"""
-        try:
-            import win10toast
-            toaster = win10toast.ToastNotifier()
-            toaster.show_toast(
+        if self._toaster is None:
+            try:
+                import win10toast
+                self._toaster = win10toast.ToastNotifier()
+            except ImportError:
+                self._toaster = False
+        
+        if self._toaster:
+            self._toaster.show_toast(
                 title,
                 message,
                 duration=duration // 1000,  # 轉換為秒
                 threaded=True
             )
-        except ImportError:
+        else:
             # 備用方案：使用PowerShell
             self._show_windows_powershell_notification(title, message)
     
     def _show_windows_powershell_notification(self, title: str, message: str):
         """使用PowerShell顯示Windows通知"""
-        script = f'''
-        Add-Type -AssemblyName System.Windows.Forms
-        $balloon = New-Object System.Windows.Forms.NotifyIcon
-        $balloon.Icon = [System.Drawing.SystemIcons]::Information
-        $balloon.BalloonTipIcon = "Info"
-        $balloon.BalloonTipText = "{message}"
-        $balloon.BalloonTipTitle = "{title}"
-        $balloon.Visible = $true
-        $balloon.ShowBalloonTip(5000)
-        '''
+        import subprocess
+        env = dict(os.environ, DESKTOP_PET_NOTIFY_TITLE=title, DESKTOP_PET_NOTIFY_MESSAGE=message)
         try:
-            subprocess.run(["powershell", "-Command", script], 
-                          capture_output=True, text=True, timeout=10)
-        except Exception as e:
+            # -NoProfile跳過用戶配置文件的載入；不顯示控制台窗口（僅Windows有此標誌）
+            self._spawn(["powershell", "-NoProfile", "-NonInteractive",
+                         "-EncodedCommand", self._PS_ENCODED],
+                        env=env, creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0))
+        except OSError as e:
             logger.error(f"PowerShell通知失敗: {e}")
     
     def _show_macos_notification(self, title: str, message: str, duration: int):
@@ -135,22 +166,40 @@ class CrossPlatformNotifier(QObject):
         display notification "{message}" with title "{title}" sound name "default"
         '''
         try:
-            subprocess.run(["osascript", "-e", script], 
-                          capture_output=True, text=True, timeout=10)
-        except Exception as e:
+            self._spawn(["osascript", "-e", script])
+        except OSError as e:
             logger.error(f"macOS通知失敗: {e}")
     
     def _show_linux_notification(self, title: str, message: str, duration: int):
         """Linux原生通知"""
         try:
-            subprocess.run([
+            self._spawn([
                 "notify-send", 
                 title, 
                 message, 
                 f"--expire-time={duration}"
-            ], capture_output=True, text=True, timeout=10)
-        except Exception as e:
+            ])
+        except OSError as e:
             logger.error(f"Linux通知失敗: {e}")
+    
+    def cleanup(self):
+        """清理資源"""
+        # 釋放ToastNotifier及其註冊的窗口類
+        self._toaster = None
+        self._reap_children()
+    
+    def _spawn(self, args: list, **kwargs):
+        """在後台啟動通知進程，不等待其結束，避免阻塞界面線程"""
+        import subprocess
+        # 順帶回收已結束的子進程，避免殭屍進程累積
+        self._reap_children()
+        self._children.append(subprocess.Popen(
+            args, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL, close_fds=True, **kwargs))
+    
+    def _reap_children(self):
+        """回收已結束的通知子進程（poll不阻塞）"""
+        self._children = [child for child in self._children if child.poll() is None]
 
 
 class ReminderScheduler(QObject):
@@ -161,7 +210,13 @@ class ReminderScheduler(QObject):
     def __init__(self):
         super().__init__()
         self.reminders = {}  # 存儲提醒任務
-        self.active_timers = {}  # 活動的定時器
+        self._active = {}  # 活動中的提醒: 名稱 -> 下次觸發時間（毫秒）
+        self._heap = []    # (觸發時間, 名稱) 最小堆，停止或重啟的舊項在出堆時跳過
+        
+        # 所有提醒共用一個定時器，只對準最近的觸發時間
+        self._tick = QTimer(self)
+        self._tick.setSingleShot(True)
+        self._tick.timeout.connect(self._fire_due)
         
         # 預設提醒消息
         self.default_reminders = {
@@ -172,8 +227,7 @@ class ReminderScheduler(QObject):
                     "別忘了喝水！你已經專注工作很久了",
                     "來杯水吧！讓大腦保持清醒"
                 ],
-                "interval": 30,  # 分鐘
-                "current_index": 0
+                "interval": 30  # 分鐘
             },
             "posture": {
                 "title": "🪑 姿勢提醒",
@@ -182,8 +236,7 @@ class ReminderScheduler(QObject):
                     "調整一下坐姿，預防頸椎問題",
                     "坐姿端正，身體更健康！"
                 ],
-                "interval": 45,
-                "current_index": 0
+                "interval": 45
             },
             "rest": {
                 "title": "😴 休息提醒",
@@ -192,8 +245,7 @@ class ReminderScheduler(QObject):
                     "工作辛苦了！起來走動走動吧",
                     "休息是為了走更長的路，放鬆一下吧！"
                 ],
-                "interval": 60,
-                "current_index": 0
+                "interval": 60
             },
             "exercise": {
                 "title": "🏃 運動提醒",
@@ -202,10 +254,11 @@ class ReminderScheduler(QObject):
                     "簡單的伸展運動對身體很有好處",
                     "運動一下，保持活力！"
                 ],
-                "interval": 90,
-                "current_index": 0
+                "interval": 90
             }
         }
+        for reminder in self.default_reminders.values():
+            reminder["_iter"] = cycle(reminder["messages"])
         
         logger.info("提醒調度器初始化完成")
     
@@ -216,7 +269,7 @@ class ReminderScheduler(QObject):
             "title": title,
             "messages": messages,
             "interval": interval_minutes,
-            "current_index": 0
+            "_iter": cycle(messages)  # 輪流取出消息；更換消息列表時需重建
         }
         
         if auto_start:
@@ -227,25 +280,17 @@ class ReminderScheduler(QObject):
     def start_reminder(self, name: str):
         """開始指定提醒"""
         if name in self.reminders:
-            self.stop_reminder(name)  # 先停止現有的
-            
-            reminder = self.reminders[name]
-            interval_ms = reminder["interval"] * 60 * 1000
-            
-            timer = QTimer()
-            timer.timeout.connect(lambda: self._trigger_reminder(name))
-            timer.start(interval_ms)
-            
-            self.active_timers[name] = timer
+            # 覆蓋現有的觸發時間，堆中的舊項隨之失效
+            self._schedule(name, self._now_ms())
+            self._rearm()
             logger.info(f"提醒已啟動: {name}")
         else:
             logger.error(f"提醒不存在: {name}")
     
     def stop_reminder(self, name: str):
         """停止指定提醒"""
-        if name in self.active_timers:
-            self.active_timers[name].stop()
-            del self.active_timers[name]
+        if self._active.pop(name, None) is not None:
+            self._rearm()
             logger.info(f"提醒已停止: {name}")
     
     def start_all_default_reminders(self):
@@ -257,22 +302,51 @@ class ReminderScheduler(QObject):
     
     def stop_all_reminders(self):
         """停止所有提醒"""
-        for name in list(self.active_timers.keys()):
-            self.stop_reminder(name)
+        self._active.clear()
+        self._heap.clear()
+        self._tick.stop()
         logger.info("所有提醒已停止")
     
+    @staticmethod
+    def _now_ms() -> int:
+        """單調時鐘的當前時間（毫秒）"""
+        return int(time.monotonic() * 1000)
+    
+    def _schedule(self, name: str, now_ms: int):
+        """從now_ms起按提醒間隔安排下一次觸發"""
+        deadline = now_ms + self.reminders[name]["interval"] * 60 * 1000
+        self._active[name] = deadline
+        heapq.heappush(self._heap, (deadline, name))
+    
+    def _rearm(self):
+        """丟棄堆頂的失效項，並將定時器對準最近的觸發時間"""
+        heap = self._heap
+        while heap and self._active.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+        
+        if heap:
+            self._tick.start(max(0, heap[0][0] - self._now_ms()))
+        else:
+            self._tick.stop()
+    
+    def _fire_due(self):
+        """觸發所有已到期的提醒，並安排它們的下一次觸發"""
+        now_ms = self._now_ms()
+        heap = self._heap
+        while heap and heap[0][0] <= now_ms:
+            deadline, name = heapq.heappop(heap)
+            if self._active.get(name) != deadline:
+                continue  # 已停止或已重啟
+            self._schedule(name, now_ms)
+            self._trigger_reminder(name)
+        self._rearm()
+    
     def _trigger_reminder(self, name: str):
         """觸發提醒"""
         if name in self.reminders:
             reminder = self.reminders[name]
-            messages = reminder["messages"]
-            current_index = reminder["current_index"]
-            
             title = reminder["title"]
-            message = messages[current_index]
-            
-            # 更新消息索引
-            reminder["current_index"] = (current_index + 1) % len(messages)
+            message = next(reminder["_iter"])
             
             self.reminder_triggered.emit(title, message)
             logger.info(f"提醒觸發: {name} - {message}")
@@ -283,14 +357,14 @@ class ReminderScheduler(QObject):
             self.reminders[name]["interval"] = interval_minutes
             
             # 如果提醒正在運行，重新啟動
-            if name in self.active_timers:
+            if name in self._active:
                 self.start_reminder(name)
             
             logger.info(f"提醒間隔已更新: {name} = {interval_minutes}分鐘")
     
     def get_active_reminders(self) -> list:
         """獲取活動中的提醒列表"""
-        return list(self.active_timers.keys())
+        return list(self._active)
     
     def cleanup(self):
         """清理資源"""
@@ -306,14 +380,15 @@ class SmartNotificationManager(QObject):
         self.notifier = notifier
         self.scheduler = ReminderScheduler()
         
-        # 通知歷史
-        self.notification_history = []
+        # 通知歷史，超出上限時deque自動丟棄最舊的記錄
         self.max_history = 50
+        self.notification_history = deque(maxlen=self.max_history)
         
         # 免打擾模式
         self.do_not_disturb = False
         self.quiet_hours_start = None  # 時間對象
         self.quiet_hours_end = None
+        self._quiet_cache = None  # (分鐘序號, 是否在免打擾時段)，同一分鐘內不重算
         
         # 連接信號
         self.scheduler.reminder_triggered.connect(self._handle_reminder)
@@ -345,28 +420,34 @@ class SmartNotificationManager(QObject):
             return True
         
         if self.quiet_hours_start and self.quiet_hours_end:
+            # 時段精確到分鐘，同一分鐘內的結果可直接重用
+            minute = int(time.time() // 60)
+            cached = self._quiet_cache
+            if cached is not None and cached[0] == minute:
+                return cached[1]
+            
             now = datetime.now().time()
             if self.quiet_hours_start <= self.quiet_hours_end:
-                return self.quiet_hours_start <= now <= self.quiet_hours_end
+                quiet = self.quiet_hours_start <= now <= self.quiet_hours_end
             else:  # 跨越午夜
-                return now >= self.quiet_hours_start or now <= self.quiet_hours_end
+                quiet = now >= self.quiet_hours_start or now <= self.quiet_hours_end
+            self._quiet_cache = (minute, quiet)
+            return quiet
         
         return False
     
     def _add_to_history(self, title: str, message: str, notification_type: NotificationType):
         """添加到通知歷史"""
+        # 只記錄時間戳，讀取歷史時才轉換為datetime
         entry = {
-            "timestamp": datetime.now(),
+            "ts_monotonic": time.monotonic(),
+            "ts_epoch": time.time(),
             "title": title,
             "message": message,
-            "type": notification_type.value
+            "type": notification_type.name.lower()
         }
         
         self.notification_history.append(entry)
-        
-        # 限制歷史記錄數量
-        if len(self.notification_history) > self.max_history:
-            self.notification_history.pop(0)
     
     def set_do_not_disturb(self, enabled: bool):
         """設置免打擾模式"""
@@ -376,14 +457,17 @@ class SmartNotificationManager(QObject):
     def set_quiet_hours(self, start_hour: int, start_minute: int,
                        end_hour: int, end_minute: int):
         """設置免打擾時間段"""
-        from datetime import time
-        self.quiet_hours_start = time(start_hour, start_minute)
-        self.quiet_hours_end = time(end_hour, end_minute)
+        self.quiet_hours_start = day_time(start_hour, start_minute)
+        self.quiet_hours_end = day_time(end_hour, end_minute)
+        self._quiet_cache = None
         logger.info(f"免打擾時間: {self.quiet_hours_start} - {self.quiet_hours_end}")
     
     def get_notification_history(self, limit: int = 10) -> list:
-        """獲取通知歷史"""
-        return self.notification_history[-limit:]
+        """獲取最近limit條通知歷史，limit不大於0時返回全部"""
+        history = self.notification_history
+        start = max(0, len(history) - limit) if limit > 0 else 0
+        return [dict(entry, timestamp=datetime.fromtimestamp(entry["ts_epoch"]))
+                for entry in islice(history, start, None)]
     
     def start_default_reminders(self):
         """啟動預設提醒"""
@@ -396,4 +480,5 @@ class SmartNotificationManager(QObject):
     def cleanup(self):
         """清理資源"""
         self.scheduler.cleanup()
+        self.notifier.cleanup()
         logger.info("智能通知管理器資源已清理") 
\ No newline at end of file